@@ -0,0 +1,152 @@
+import time
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from collections import OrderedDict
+import positions
+import regions
+
+REGIONS = regions.REGIONS
+
+_windows = OrderedDict()
+_lock = threading.Lock()
+_scope = threading.local()
+
+def speed_quartiles(speeds: np.ndarray) -> tuple:
+    q1, q2, q3 = np.percentile(speeds, [25, 50, 75])
+    return float(q1), float(q2), float(q3)
+
+def bottom_units(df_speed: pd.DataFrame, n: int = 3, min_iqr: float = 5, min_median: float = 1) -> list:
+    """Return [(label, speeds, (q1, q2, q3)), ...] for all units followed by the n slowest units
+    whose speed spread is at least min_iqr."""
+    speeds = df_speed["pos_speed"].to_numpy()
+    units = df_speed["mobileid"]
+    if isinstance(units.dtype, pd.CategoricalDtype):
+        codes, uniques = units.cat.codes.to_numpy(), units.cat.categories
+    else:
+        codes, uniques = pd.factorize(units)
+    codes = codes.astype(np.int16 if len(uniques) < 2 ** 15 else np.int32)
+    valid = ~np.isnan(speeds) & (codes >= 0)
+    speeds, codes = speeds[valid], codes[valid]
+    result = [("ALL UNIT", speeds, speed_quartiles(speeds))]
+
+    counts = np.bincount(codes, minlength=len(uniques))
+    means = np.bincount(codes, weights=speeds, minlength=len(uniques)) / np.maximum(counts, 1)
+    means[counts == 0] = np.inf
+    sorted_speeds = speeds[np.argsort(codes, kind="stable")]
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    for u in np.argsort(means, kind="stable"):
+        if counts[u] == 0 or len(result) > n:
+            break
+        unit_speeds = sorted_speeds[bounds[u]:bounds[u + 1]]
+        q1, q2, q3 = speed_quartiles(unit_speeds)
+        if q3 - q1 >= min_iqr and q2 > min_median:
+            result.append((f"{uniques[u]}", unit_speeds, (q1, q2, q3)))
+    return result
+
+def in_region(df: pd.DataFrame, region: str) -> pd.Series:
+    if "region_mask" in df.columns:
+        return (df["region_mask"] & regions.region_bit(region)) != 0
+    return pd.Series(regions.in_bbox(df["pos_lat"].to_numpy(), df["pos_lon"].to_numpy(), region), index=df.index)
+
+def production_mask(df: pd.DataFrame, region: str) -> pd.Series:
+    if "pos_excluded" in df.columns:
+        excluded = df["pos_excluded"]
+    else:
+        excluded = pd.Series(regions.excluded_flag(df["pos_name"]), index=df.index)
+    return (
+        df["mobileactivityid"].isin([1, 5]) &
+        (df["mobilestatusid"] == "PRD") &
+        in_region(df, region) &
+        ~excluded
+    )
+
+class PositionSource:
+    def __init__(self, server: str, database: str, window_hours: float = 1, end_time: str = None,
+                 snapshot_dir: str = None, offline: bool = False, columns: list = None):
+        self.server = server
+        self.database = database
+        self.window_hours = window_hours
+        self.end_time = end_time
+        self.snapshot_dir = snapshot_dir
+        self.offline = offline
+        self.columns = columns
+
+    @property
+    def key(self):
+        # only a snapshot read is projected; online windows come whole from the shared store
+        columns = tuple(self.columns) if self.offline and self.columns else None
+        return (self.server.lower(), self.database.lower(), self.window_hours, self.end_time, self.offline, columns)
+
+    def load(self, region: str = None) -> pd.DataFrame:
+        start, end = positions.window_bounds(self.window_hours, self.end_time)
+        if self.offline:
+            bbox = REGIONS[region] if region else None
+            return positions.PositionSnapshot(self.snapshot_dir).read(start, end, bbox=bbox, columns=self.columns)
+        df = positions.get_store(self.server, self.database, snapshot_dir=self.snapshot_dir).window(start, end)
+        return df[in_region(df, region)].reset_index(drop=True) if region else df
+
+class ProductionWindow:
+    def __init__(self, df: pd.DataFrame, region: str, full: bool):
+        self.df = df
+        self.region = region
+        self.full = full
+        self.df_speed = df[production_mask(df, region)]
+        self.created_at = time.time()
+
+@contextmanager
+def memo_scope(run=None, refresh: bool = False):
+    """Scope production_window's memo on this thread: reports of one scheduler run share windows keyed by
+    `run`, and refresh=True always reloads (the fresh window still replaces the cached one)."""
+    previous = (getattr(_scope, "run", None), getattr(_scope, "refresh", False))
+    _scope.run, _scope.refresh = run if run is not None else previous[0], refresh or previous[1]
+    try:
+        yield
+    finally:
+        _scope.run, _scope.refresh = previous
+
+def production_window(source: PositionSource, region: str, full: bool = False, max_age: float = 300) -> ProductionWindow:
+    """Filtered production frame for (source window, region, memo_scope run), shared between reports for
+    max_age seconds. full=True also keeps the rows outside the region in window.df."""
+    key = (source.key, region, getattr(_scope, "run", None))
+    with _lock:
+        window = None if getattr(_scope, "refresh", False) else _windows.get(key)
+        if window and time.time() - window.created_at <= max_age and (window.full or not full):
+            _windows.move_to_end(key)
+            return window
+    window = ProductionWindow(source.load(None if full else region), region, full)
+    with _lock:
+        _windows[key] = window
+        while len(_windows) > 16:
+            _windows.popitem(last=False)
+    return window
+
+def clear():
+    with _lock:
+        _windows.clear()
+
+def plot_underspeed(df_speed: pd.DataFrame, path: str):
+    distribution = bottom_units(df_speed[df_speed["pos_speed"] > 1], n=3)
+    data = [speeds for _, speeds, _ in distribution]
+    labels = [label for label, _, _ in distribution]
+    fig = Figure(figsize=(8,6))
+    ax = fig.add_subplot()
+    box = ax.boxplot(data, patch_artist=True, showfliers=False)
+    ax.set_xticks(range(1, len(labels) + 1), labels)
+    colors = ["orange"] + ["lightblue"] * (len(data)-1)
+    for patch, color in zip(box["boxes"], colors):
+        patch.set_facecolor(color)
+    for i, (_, _, (q1, q2, q3)) in enumerate(distribution, start=1):
+        ax.text(i, q1, f"{q1:.1f}", ha="center", va="bottom", fontsize=12)
+        ax.text(i, q2, f"{q2:.1f}", ha="center", va="bottom", fontsize=12)
+        ax.text(i, q3, f"{q3:.1f}", ha="center", va="bottom", fontsize=12)
+    ax.set_ylabel("Speed (kph)", fontsize=18, fontweight="bold")
+    ax.tick_params(axis="x", labelsize=20)
+    ax.tick_params(axis="y", labelsize=18)
+    for label in ax.get_xticklabels() + ax.get_yticklabels():
+        label.set_fontweight("bold")
+    ax.set_title("Boxplot of pos_speed (All Units vs Bottom 3 Units)")
+    ax.grid(axis="y", linestyle="--", alpha=0.7)
+    fig.savefig(path, bbox_inches="tight", dpi=150)
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analytics
+
+def synthetic_shift(units: int = 400, rows: int = 3_000_000, max_spread: float = 10, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    unit_ids = np.array([f"DT{3000 + i}" for i in range(units)])
+    unit_speed = rng.uniform(12, 30, units)
+    unit_spread = rng.uniform(1, max_spread, units)
+    codes = rng.integers(0, units, rows)
+    speeds = rng.normal(unit_speed[codes], unit_spread[codes]).clip(1.01, 60).astype("float32")
+    return pd.DataFrame({
+        "mobileid": pd.Categorical.from_codes(codes, categories=unit_ids),
+        "reporttime": pd.Timestamp("2025-06-06 21:00:00") + pd.to_timedelta(rng.integers(0, 3600, rows), unit="s"),
+        "mobiletypeid": np.full(rows, 2, dtype="int8"),
+        "pos_lon": rng.uniform(117.435, 117.475, rows).astype("float32"),
+        "pos_lat": rng.uniform(0.682, 0.702, rows).astype("float32"),
+        "pos_name": pd.Categorical.from_codes(rng.integers(0, 50, rows), categories=[f"SEG{i:02d}" for i in range(50)]),
+        "pos_speed": speeds,
+        "mobileactivityid": rng.choice(np.array([1, 5], dtype="int8"), rows),
+        "mobilestatusid": pd.Categorical(np.full(rows, "PRD")),
+        "plm_inc": rng.uniform(0, 10, rows).astype("float32"),
+    })
+
+def legacy_bottom_units(df_speed: pd.DataFrame, n: int = 3) -> list:
+    bottom_units = []
+    for u in df_speed.groupby("mobileid", observed=True)["pos_speed"].mean().sort_values().index:
+        speeds = df_speed.loc[df_speed["mobileid"] == u, "pos_speed"].dropna().to_numpy()
+        q1, q2, q3 = np.percentile(speeds, [25, 50, 75])
+        if q3 - q1 >= 5 and q2 > 1:
+            bottom_units.append(u)
+        if len(bottom_units) == n:
+            break
+    data = [df_speed["pos_speed"].dropna().to_numpy()] + [
+        df_speed.loc[df_speed["mobileid"] == u, "pos_speed"].dropna().to_numpy() for u in bottom_units]
+    return ["ALL UNIT"] + [f"{u}" for u in bottom_units], [np.percentile(d, [25, 50, 75]) for d in data]
+
+def timed(fn, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def compare(df: pd.DataFrame, scenario: str):
+    legacy_time, (legacy_labels, legacy_quartiles) = timed(legacy_bottom_units, df)
+    vector_time, distribution = timed(analytics.bottom_units, df)
+    labels = [label for label, _, _ in distribution]
+    assert labels == legacy_labels, (labels, legacy_labels)
+    for (_, _, quartiles), expected in zip(distribution, legacy_quartiles):
+        assert np.allclose(quartiles, expected, atol=1e-3), (quartiles, expected)
+    print(f"{scenario:<28} legacy {legacy_time:7.3f}s  single-pass {vector_time:7.3f}s  "
+          f"speedup {legacy_time / vector_time:6.1f}x")
+
+def main():
+    units = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 3_000_000
+    print(f"Synthetic shift: {units} units, {rows:,} points")
+    compare(synthetic_shift(units, rows, max_spread=10), "wide spread (early exit)")
+    narrow = synthetic_shift(units, rows, max_spread=3.8)
+    compare(narrow, "narrow spread (long scan)")
+    narrow["mobileid"] = narrow["mobileid"].astype(object)
+    compare(narrow, "narrow spread, object ids")
+
+if __name__ == "__main__":
+    main()
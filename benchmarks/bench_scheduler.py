@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cron
+
+def schedule(groups: int, slots: int):
+    entries = []
+    for g in range(groups):
+        for s in range(slots):
+            minute = (s * 37) % (24 * 60)
+            entries.append((f"group{g}", f"{minute // 60:02d}:{minute % 60:02d}", ["produksi ob", "total unit"]))
+    return entries
+
+def legacy_scan(entries, now: datetime, lead: float):
+    due = []
+    for group, schedule_time, commands in entries:
+        slot = datetime.strptime(schedule_time, "%H:%M").replace(year=now.year, month=now.month, day=now.day)
+        for command in commands:
+            for candidate in (slot, slot + timedelta(days=1)):
+                if candidate - timedelta(seconds=lead) <= now <= candidate + timedelta(minutes=10):
+                    due.append((candidate, command, group))
+    return due
+
+def main():
+    groups = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    slots = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    loops = 20_000
+    entries = schedule(groups, slots)
+    start = datetime(2026, 1, 5, 6, 0)
+    print(f"{len(entries)} schedule entries, {loops:,} loop iterations (0.5s poll over ~{loops / 7200:.1f}h)")
+
+    started = time.perf_counter()
+    scanned = 0
+    for i in range(loops):
+        scanned += len(legacy_scan(entries, start + timedelta(seconds=i / 2), 120))
+    legacy = time.perf_counter() - started
+
+    engine = cron.ScheduleEngine()
+    started = time.perf_counter()
+    engine.build("bench", entries, lambda command: 120, now=start)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    fired = 0
+    for i in range(loops):
+        fired += len(engine.pop_due(start + timedelta(seconds=i / 2)))
+    heap = time.perf_counter() - started
+
+    print(f"legacy scan  {legacy * 1e6 / loops:8.1f} us/loop  ({scanned:,} due hits across loops)")
+    print(f"heap engine  {heap * 1e6 / loops:8.1f} us/loop  ({fired:,} events fired, build {build * 1e3:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import Job, JobQueue, Logger
+
+class QuietLogger(Logger):
+    def log(self, level, msg):
+        pass
+
+def workload(users: int, heavy_jobs: int, light_jobs: int):
+    """One user fires a batch of heavy_jobs, the others send light_jobs each shortly after."""
+    plan = [("user0", 0.0)] * heavy_jobs
+    for u in range(1, users):
+        plan += [(f"user{u}", 0.05)] * light_jobs
+    return plan
+
+def legacy_fifo(plan, workers: int, build_time: float):
+    executor = ThreadPoolExecutor(max_workers=workers)
+    latencies, lock = {}, threading.Lock()
+    def run(sender, created):
+        time.sleep(build_time)
+        with lock:
+            latencies.setdefault(sender, []).append(time.time() - created)
+    started = time.time()
+    for sender, delay in plan:
+        time.sleep(delay)
+        executor.submit(run, sender, time.time())
+    executor.shutdown(wait=True)
+    return latencies, time.time() - started
+
+def fair_queue(plan, workers: int, build_time: float):
+    jobs = JobQueue(QuietLogger(), workers)
+    latencies = {}
+    started = time.time()
+    for sender, delay in plan:
+        time.sleep(delay)
+        job = Job("bench", "text", sender, lambda: time.sleep(build_time), [])
+        jobs.submit(job)
+    while jobs.pending:
+        for job in jobs.completed():
+            latencies.setdefault(job.sender, []).append(job.finished_at - job.created_at)
+        time.sleep(0.01)
+    jobs.shutdown()
+    return latencies, time.time() - started
+
+def report(name: str, latencies: dict, elapsed: float):
+    served = sum(len(v) for v in latencies.values())
+    heavy = latencies.pop("user0")
+    light = [t for v in latencies.values() for t in v]
+    print(f"{name:<12} {served * 60 / elapsed:7.1f} commands/min  "
+          f"batch user mean {sum(heavy) / len(heavy):5.2f}s  "
+          f"other users mean {sum(light) / len(light):5.2f}s  max {max(light):5.2f}s")
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    build_time = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    workers = 2
+    plan = workload(users, heavy_jobs=12, light_jobs=2)
+    print(f"{users} users, {len(plan)} commands, {workers} workers, {build_time}s per report")
+    report("fifo", *legacy_fifo(plan, workers, build_time))
+    report("fair", *fair_queue(plan, workers, build_time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import requests
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ssrs
+
+def report_png(width: int = 3000, height: int = 800) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+class StubReportServer(BaseHTTPRequestHandler):
+    """Answers ReportServer URL-access requests with a PNG, or an HTML error page for a share of them."""
+    png = report_png()
+    latency = 0.05
+    failure_rate = 0.0
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+        time.sleep(self.latency)
+        if query.get("rs:Format") != ["IMAGE"] or random.random() < self.failure_rate:
+            body = b"<html><body>Report processing error</body></html>"
+            self.send_response(500)
+            self.send_header("Content-Type", "text/html")
+        else:
+            body = self.png
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def run(name: str, export, url: str, requests_count: int, out_dir: str):
+    times, failed = [], 0
+    for i in range(requests_count):
+        started = time.perf_counter()
+        try:
+            export(url, {"date": "2025-06-06", "shift": ["1", "2"], "material": "OB"}, os.path.join(out_dir, f"{i}.png"))
+            times.append(time.perf_counter() - started)
+        except ssrs.ExportError:
+            failed += 1
+    times.sort()
+    median = times[len(times) // 2] if times else 0
+    print(f"{name:<16} median {median * 1000:7.1f} ms  p95 {times[int(len(times) * 0.95) - 1] * 1000 if times else 0:7.1f} ms  "
+          f"failed {failed / requests_count:5.1%}")
+
+def unpooled_export(url, parameters, path):
+    response = requests.get(ssrs.export_url(url, parameters, "IMAGE", {"OutputFormat": "PNG"}), timeout=60)
+    if response.status_code != 200:
+        raise ssrs.ExportError(response.status_code)
+    with open(path, "wb") as f:
+        f.write(response.content)
+
+def main():
+    requests_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    StubReportServer.failure_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubReportServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/ReportServer?%2freport+bangjo"
+    out_dir = tempfile.mkdtemp()
+    print(f"Stub ReportServer at {url}, {requests_count} exports, "
+          f"{StubReportServer.latency * 1000:.0f} ms server time, {len(StubReportServer.png) / 1024:.0f} KB PNG")
+    run("new connection", unpooled_export, url, requests_count, out_dir)
+    run("pooled session", lambda u, p, path: ssrs.export(u, p, path), url, requests_count, out_dir)
+    server.shutdown()
+    ssrs.close()
+
+if __name__ == "__main__":
+    main()
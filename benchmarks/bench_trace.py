@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import folium
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "python"))
+import positions
+import regions
+from DotTraceDT import DotTraceDT
+
+def synthetic_window(region: str, rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    max_lat, min_lat, max_lon, min_lon = DotTraceDT.REGIONS[region]
+    df = pd.DataFrame({
+        "mobileid": rng.choice([f"DT{3000 + i}" for i in range(200)], rows),
+        "reporttime": pd.Timestamp("2025-06-06 21:00:00") + pd.to_timedelta(rng.integers(0, 3600, rows), unit="s"),
+        "mobiletypeid": 2,
+        "pos_lon": rng.uniform(min_lon, max_lon, rows),
+        "pos_lat": rng.uniform(min_lat, max_lat, rows),
+        "pos_name": rng.choice([f"SEG{i:02d}" for i in range(50)], rows),
+        "pos_speed": rng.uniform(0, 40, rows),
+        "mobileactivityid": rng.choice([1, 5], rows),
+        "mobilestatusid": "PRD",
+        "plm_inc": rng.uniform(0, 10, rows),
+    })
+    return regions.label(positions.compact(df))
+
+def build(report: DotTraceDT, mode: str, out_dir: str):
+    report.trace_mode = mode
+    started = time.perf_counter()
+    m = folium.Map(location=report.center, zoom_start=15, tiles="OpenStreetMap", width="80%", height="100%")
+    m.fit_bounds(report.bounds)
+    if mode == "points":
+        report._add_trace(m)
+    else:
+        report._add_trace_raster(m)
+    path = os.path.join(out_dir, f"trace_{mode}.html")
+    m.save(path)
+    return time.perf_counter() - started, os.path.getsize(path), path
+
+def screenshot(path: str):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--window-size=1366,900")
+    driver = webdriver.Chrome(options=options)
+    try:
+        started = time.perf_counter()
+        driver.get(f"file:///{os.path.abspath(path).replace(os.sep, '/')}")
+        driver.execute_async_script("var done = arguments[0]; requestAnimationFrame(() => requestAnimationFrame(done));")
+        driver.find_element("xpath", "/html/body").screenshot(path + ".png")
+        return time.perf_counter() - started
+    finally:
+        driver.quit()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with_screenshot = "--screenshot" in sys.argv
+    region = "PA2-SELATAN"
+    report = DotTraceDT(region, tif_path=None, server="", database="")
+    report.df = synthetic_window(region, rows)
+    out_dir = tempfile.mkdtemp()
+    print(f"Dot trace {region}: {rows:,} points")
+    for mode in ("points", "raster"):
+        elapsed, size, path = build(report, mode, out_dir)
+        line = f"{mode:<7} build {elapsed:7.2f}s  html {size / 1024 / 1024:7.2f} MB"
+        if with_screenshot:
+            line += f"  screenshot {screenshot(path):6.2f}s"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+class ScheduleError(ValueError):
+    pass
+
+def _field(text: str, low: int, high: int, names: dict = None) -> set:
+    values = set()
+    for part in text.lower().split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        else:
+            start, _, end = part.partition("-")
+            start = names.get(start, start) if names else start
+            end = (names.get(end, end) if names else end) if end else (high if step else start)
+            try:
+                start, end = int(start), int(end)
+            except ValueError:
+                raise ScheduleError(f"Unable to parse '{text}'") from None
+        if not low <= start <= end <= high:
+            raise ScheduleError(f"'{text}' is outside {low}-{high}")
+        values.update(range(start, end + 1, int(step or 1)))
+    return values
+
+def _clock(text: str, shifts: dict) -> tuple:
+    """'07:00', 'shift1' or 'shift1+02:30' / 'shift2-00:15' -> (hour, minute)."""
+    for sign in "+-":
+        if sign in text and not text.startswith(sign):
+            base, offset = text.split(sign, 1)
+            hour, minute = _clock(base, shifts)
+            off_hour, off_minute = _clock(offset, shifts)
+            total = hour * 60 + minute + (1 if sign == "+" else -1) * (off_hour * 60 + off_minute)
+            return divmod(total % (24 * 60), 60)
+    if text in shifts:
+        return _clock(shifts[text], shifts)
+    try:
+        parsed = datetime.strptime(text, "%H:%M")
+    except ValueError:
+        raise ScheduleError(f"Unknown time '{text}'") from None
+    return parsed.hour, parsed.minute
+
+class CronTrigger:
+    """Fire times matching a cron expression ('0 7 * * 1-5'), a daily time ('07:00'), weekdays plus a
+    time ('mon-fri 07:00') or a time relative to a shift start ('sat shift2-00:30')."""
+    def __init__(self, spec: str, shifts: dict = None):
+        self.spec = spec
+        fields = spec.split()
+        if len(fields) == 5:
+            minute, hour, days, months, weekdays = fields
+            self.minutes = sorted(_field(minute, 0, 59))
+            self.hours = sorted(_field(hour, 0, 23))
+        elif len(fields) in (1, 2):
+            weekdays = fields[0] if len(fields) == 2 else "*"
+            hour, minute = _clock(fields[-1], shifts or {})
+            self.minutes, self.hours, days, months = [minute], [hour], "*", "*"
+        else:
+            raise ScheduleError(f"Unable to parse schedule '{spec}'")
+        self.days = _field(days, 1, 31)
+        self.months = _field(months, 1, 12, MONTH_NAMES)
+        self.weekdays = {day % 7 for day in _field(weekdays, 0, 7, DAY_NAMES)}
+        self.any_day = days == "*"
+        self.any_weekday = weekdays == "*"
+
+    def _day_matches(self, day) -> bool:
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, after: datetime) -> datetime:
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 8):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ScheduleError(f"Schedule '{self.spec}' never fires")
+
+    def between(self, start: datetime, end: datetime) -> list:
+        """Fire times in [start, end)."""
+        slots = []
+        slot = self.next_after(start - timedelta(minutes=1))
+        while slot < end:
+            slots.append(slot)
+            slot = self.next_after(slot)
+        return slots
+
+class ScheduleEngine:
+    """Priority queue of (fire time - lead, slot, command, group) built once per schedule version."""
+    def __init__(self, grace: timedelta = timedelta(minutes=10)):
+        self.grace = grace
+        self.key = None
+        self.triggers = []
+        self.errors = []
+        self._heap = []
+        self._seq = itertools.count()
+
+    def build(self, key, entries: list, lead, shifts: dict = None, now: datetime = None) -> bool:
+        """entries: [(group, spec, commands)]; lead(command) -> seconds. Invalid entries are left out and
+        listed in self.errors. Returns False if key is unchanged."""
+        if key == self.key:
+            return False
+        now = now or datetime.now()
+        triggers, heap, self.errors = [], [], []
+        for group, spec, commands in entries:
+            try:
+                trigger = CronTrigger(spec, shifts)
+                slot = trigger.next_after(now - self.grace)
+            except ScheduleError as e:
+                self.errors.append(f"{group} '{spec}': {e}")
+                continue
+            triggers.append((group, trigger, commands))
+            for command in commands:
+                self._push(heap, trigger, slot, command, group, lead(command))
+        self.key, self.triggers, self._heap, self._lead = key, triggers, heap, lead
+        return True
+
+    def _push(self, heap, trigger, slot, command, group, lead):
+        heapq.heappush(heap, (slot - timedelta(seconds=lead), next(self._seq), slot, command, group, trigger))
+
+    def pop_due(self, now: datetime = None) -> list:
+        """[(slot, command, group)] whose lead window has opened; slots past the grace period are dropped."""
+        now = now or datetime.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, slot, command, group, trigger = heapq.heappop(self._heap)
+            if now <= slot + self.grace:
+                due.append((slot, command, group))
+            self._push(self._heap, trigger, trigger.next_after(max(slot, now - self.grace)), command, group,
+                       self._lead(command))
+        return due
+
+    def seconds_until_next(self, now: datetime = None) -> float:
+        if not self._heap:
+            return float("inf")
+        return max(0.0, (self._heap[0][0] - (now or datetime.now())).total_seconds())
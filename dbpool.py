@@ -0,0 +1,129 @@
+import time
+import pyodbc
+import threading
+from contextlib import contextmanager
+
+_settings = {
+    "driver": "SQL Server",
+    "max_size": 4,
+    "idle_timeout": 300,
+    "login_timeout": 30,
+    "checkout_timeout": 60,
+}
+_pools = {}
+_lock = threading.Lock()
+
+class ConnectionPool:
+    def __init__(self, server: str, database: str):
+        self.server = server
+        self.database = database
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @property
+    def conn_str(self):
+        return (
+            f"Driver={{{_settings['driver']}}};"
+            f"Server={self.server};"
+            f"Database={self.database};"
+            "Trusted_Connection=yes;")
+
+    def _connect(self):
+        return pyodbc.connect(self.conn_str, timeout=_settings["login_timeout"], autocommit=True)
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+
+    def _evict_idle(self):
+        deadline = time.time() - _settings["idle_timeout"]
+        expired = [conn for conn, last_used in self._idle if last_used < deadline]
+        self._idle = [(conn, last_used) for conn, last_used in self._idle if last_used >= deadline]
+        for conn in expired:
+            self._close(conn)
+
+    def acquire(self):
+        conn = None
+        with self._cond:
+            self._evict_idle()
+            while not self._idle and self._in_use >= _settings["max_size"]:
+                if not self._cond.wait(_settings["checkout_timeout"]):
+                    raise TimeoutError(f"No free connection to {self.server}/{self.database} "
+                                       f"after {_settings['checkout_timeout']}s")
+            if self._idle:
+                conn, _ = self._idle.pop()
+            self._in_use += 1
+        try:
+            if conn is not None and not self._healthy(conn):
+                self._close(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            conn.timeout = 0  # a query timeout set by the previous borrower must not carry over
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.time()))
+            self._evict_idle()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except pyodbc.Error:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+def configure(**settings):
+    _settings.update({k: v for k, v in settings.items() if k in _settings})
+
+def get_pool(server: str, database: str) -> ConnectionPool:
+    key = (server.lower(), database.lower())
+    with _lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(server, database)
+        return _pools[key]
+
+def connection(server: str, database: str):
+    return get_pool(server, database).connection()
+
+def close_all():
+    with _lock:
+        for pool in _pools.values():
+            pool.close()
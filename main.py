@@ -1,25 +1,149 @@
 import os
+import cron
 import glob
 import time
 import json
+import uuid
+import base64
+import queue
+import ssrs
 import signal
+import settings
+import plugins
 import random
-import pyodbc
+import router
+import schedule_store
+import dbpool
+import threading
 import traceback
-import importlib.util
+import mimetypes
+from contextlib import contextmanager
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from colorama import Fore, Style, init
+import numpy as np
+from PIL import Image
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import (TimeoutException, NoSuchElementException,
+                                        StaleElementReferenceException, WebDriverException)
 from selenium.webdriver.common.keys import Keys
 
+MESSAGE_INTAKE_JS = """
+var pane = document.querySelector('#main');
+if (!pane) return null;
+var seen = window.__botSeen = window.__botSeen || new Set();
+window.__botInbox = window.__botInbox || [];
+function messageId(el) {
+    var row = el.closest('[data-id]') || el.querySelector('[data-id]');
+    return row ? row.getAttribute('data-id') : el.innerText;
+}
+function remember(id) {
+    seen.add(id);
+    // Sets iterate in insertion order, so this forgets the oldest ids first
+    if (seen.size > 2000) {
+        var oldest = seen.values();
+        while (seen.size > 1500) seen.delete(oldest.next().value);
+    }
+}
+if (!window.__botObserver || window.__botPane !== pane || !pane.isConnected) {
+    if (window.__botObserver) window.__botObserver.disconnect();
+    var existing = Array.prototype.slice.call(pane.querySelectorAll('div.message-in'));
+    var backlog = existing.length - (arguments[0] || 0);
+    existing.forEach(function (el, i) {
+        var id = messageId(el);
+        if (i >= backlog && !seen.has(id)) window.__botInbox.push({id: id, text: el.innerText, received_at: Date.now() / 1000});
+        remember(id);
+    });
+    window.__botObserver = new MutationObserver(function (mutations) {
+        mutations.forEach(function (mutation) {
+            mutation.addedNodes.forEach(function (node) {
+                if (node.nodeType !== 1) return;
+                var found = node.matches('div.message-in') ? [node] : node.querySelectorAll('div.message-in');
+                found.forEach(function (el) {
+                    var id = messageId(el);
+                    if (seen.has(id)) return;
+                    remember(id);
+                    window.__botInbox.push({id: id, text: el.innerText, received_at: Date.now() / 1000});
+                });
+            });
+        });
+    });
+    window.__botObserver.observe(pane, {childList: true, subtree: true});
+    window.__botPane = pane;
+}
+return window.__botInbox.splice(0);
+"""
+
+UNREAD_CHATS_JS = """
+var names = arguments[0], unread = {};
+document.querySelectorAll('#pane-side [role="listitem"], #pane-side [role="row"]').forEach(function (row) {
+    var title = row.querySelector('span[title]');
+    if (!title || names.indexOf(title.getAttribute('title')) < 0) return;
+    var badge = row.querySelector('span[aria-label*="unread"]');
+    if (badge) unread[title.getAttribute('title')] = parseInt(badge.innerText, 10) || 1;
+});
+return unread;
+"""
+
+SET_CHECKBOX_JS = """
+var box = arguments[0];
+if (!box || box.type !== 'checkbox') return false;
+if (box.checked !== arguments[1]) box.click();
+return true;
+"""
+
+NETWORK_STATE_JS = """
+var prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager && Sys.WebForms.PageRequestManager.getInstance();
+var ready = document.readyState === 'complete' && !(prm && prm.get_isInAsyncPostBack()) &&
+    Array.prototype.every.call(document.images, function (img) { return img.complete; });
+return [ready, performance.getEntriesByType('resource').length];
+"""
+
+PASTE_IMAGE_JS = """
+var element = arguments[0], encoded = arguments[1], name = arguments[2], type = arguments[3];
+var bytes;
+if (Uint8Array.fromBase64) {
+    bytes = Uint8Array.fromBase64(encoded);
+} else {
+    var binary = atob(encoded);
+    bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+}
+var dataTransfer = new DataTransfer();
+dataTransfer.items.add(new File([bytes], name, {type: type}));
+element.dispatchEvent(new ClipboardEvent('paste', {clipboardData: dataTransfer, bubbles: true, cancelable: true}));
+"""
+
+UPLOAD_DEFAULTS = {
+    "mode": "paste",
+    "attach_xpath": '//*[@title="Attach" or @aria-label="Attach"]',
+    "file_input_xpath": '//input[@type="file"][contains(@accept, "image")]',
+    "recompress": None,
+}
+
+WAIT_DEFAULTS = {
+    "poll": 0.1,
+    "network_idle": 30,
+    "network_quiet": 0.5,
+    "size_stable": 10,
+    "stable_interval": 0.25,
+    "attachment_preview": 15,
+    "preview_xpath": "//img[starts-with(@src, 'blob:')]",
+    "message_sent": 5,
+    "chat_open": 10,
+    "report_rerender": 60,
+    "typing_delay": [0.05, 0.15],
+}
+
 init(autoreset=True)
 class Logger:
+    _lock = threading.Lock()
     COLORS = {
         "DEBUG": Fore.LIGHTBLACK_EX ,
         "INFO": Fore.WHITE,
@@ -42,19 +166,241 @@ class Logger:
     def log(self, level, msg):
         timestamp = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
         log_line = f"{timestamp} [{level}] {msg}"
-        print(f"{self.COLORS.get(level, Fore.WHITE)}{log_line}{Style.RESET_ALL}")
-        with open(self.logfile, "a", encoding="utf-8") as f:
-            f.write(log_line + "\n")
+        with self._lock:
+            print(f"{self.COLORS.get(level, Fore.WHITE)}{log_line}{Style.RESET_ALL}")
+            with open(self.logfile, "a", encoding="utf-8") as f:
+                f.write(log_line + "\n")
 
     def __getattr__(self, level):
         return lambda msg: self.log(level.upper(), msg)
 
+class ServiceError(Exception):
+    """Error whose message is sent to the group as-is."""
+
+class Job:
+    def __init__(self, command: str, kind: str, sender: str, build, sessions: list, post_at: datetime = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.command = command
+        self.kind = kind
+        self.sender = sender
+        self.build = build
+        self.sessions = sessions
+        self.post_at = post_at
+        self.slot = post_at
+        self.source_build = None
+        self.commands = []
+        self.token = None
+        self.rebuilds = 0
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.steps = []
+
+class ReportTab:
+    def __init__(self, handle: str, url: str):
+        self.handle = handle
+        self.url = url
+        self.applied = []
+        self.loaded_at = time.time()
+
+class UserSession:
+    def __init__(self, sender: str):
+        self.sender = sender
+        self.started_at = time.time()
+        self.last_activity_time = self.started_at
+
+class GroupSession:
+    def __init__(self, name: str):
+        self.name = name
+        self.commands = None
+        self.command_prefixes = ()
+        self.schedule = {}
+        self.max_sessions = 5
+        self.users = OrderedDict()
+        self.latest_sender = None
+        self.scheduled = set()
+
+    def allows(self, command: str) -> bool:
+        """command is the configured command name; a "dotrace *" entry allows every "dotrace <x>" command."""
+        if self.commands is None or command in self.commands:
+            return True
+        return any(command.startswith(prefix) for prefix in self.command_prefixes)
+
+    def start(self, sender: str) -> UserSession:
+        user = self.users[sender] = UserSession(sender)
+        return user
+
+    def end(self, sender: str):
+        self.users.pop(sender, None)
+
+class ThroughputMeter:
+    def __init__(self, window: float = 300):
+        self.window = window
+        self._served = deque()
+
+    def record(self, sender: str):
+        self._served.append((time.time(), sender))
+
+    def rate(self):
+        cutoff = time.time() - self.window
+        while self._served and self._served[0][0] < cutoff:
+            self._served.popleft()
+        return len(self._served) * 60 / self.window, len({sender for _, sender in self._served})
+
+class RenderStats:
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.setdefault(mode, deque(maxlen=self.size)).append((seconds, ok))
+
+    def summary(self) -> str:
+        parts = []
+        with self._lock:
+            for mode, samples in self._samples.items():
+                times = sorted(seconds for seconds, ok in samples if ok)
+                failed = sum(1 for _, ok in samples if not ok)
+                median = times[len(times) // 2] if times else 0
+                parts.append(f"{mode} n={len(samples)} median {median:.1f}s failed {failed / len(samples):.0%}")
+        return ", ".join(parts)
+
+class StepTimer:
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        self._local.steps = []
+
+    def record(self, step: str, seconds: float):
+        steps = getattr(self._local, "steps", None)
+        if steps is not None:
+            steps.append((step, seconds))
+
+    @contextmanager
+    def measure(self, step: str):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.record(step, time.time() - started)
+
+    def collect(self) -> list:
+        steps = getattr(self._local, "steps", None) or []
+        self._local.steps = None
+        return steps
+
+class JobQueue:
+    def __init__(self, log: Logger, workers: int = 2):
+        self.log = log
+        self.workers = workers
+        self.pending = {}
+        self._queues = OrderedDict()
+        self._done = queue.Queue()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, job: Job) -> int:
+        with self._lock:
+            self.pending[job.id] = job
+            self._queues.setdefault(job.sender, deque()).append(job)
+            position = self._position(job.sender)
+        self.log.debug(f"Queued job {job.id}: {job.command} from {job.sender} (position {position})")
+        self._executor.submit(self._run_next)
+        return position
+
+    def _position(self, sender: str) -> int:
+        depth = len(self._queues[sender])
+        running = sum(1 for job in self.pending.values() if job.started_at is not None)
+        ahead = sum(min(len(jobs), depth) for other, jobs in self._queues.items() if other != sender)
+        return running + ahead + depth
+
+    def _run_next(self):
+        with self._lock:
+            sender, jobs = next(iter(self._queues.items()))
+            job = jobs.popleft()
+            job.started_at = time.time()
+            del self._queues[sender]
+            if jobs:
+                self._queues[sender] = jobs
+        try:
+            job.result = job.build()
+        except Exception as e:
+            job.error = e
+            job.traceback = traceback.format_exc()
+        job.finished_at = time.time()
+        self._done.put(job)
+
+    def completed(self):
+        while True:
+            try:
+                job = self._done.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                self.pending.pop(job.id, None)
+            yield job
+
+    def has_pending(self, sender: str, session: GroupSession) -> bool:
+        with self._lock:
+            return any(job.sender == sender and session in job.sessions for job in self.pending.values())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class QueryCache:
+    def __init__(self, log: Logger, max_size: int = 128):
+        self.log = log
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                self.log.debug(f"SQL cache miss for {key} (hits={self.hits}, misses={self.misses})")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.log.debug(f"SQL cache hit for {key} (hits={self.hits}, misses={self.misses})")
+            return entry[1]
+
+    def put(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
 class WhatsAppBot:
     def __init__(self, user_data_dir: str = None, session_timeout: int = 60, default_timeout: int = 30):
         self.log = Logger()
         self.log.info("Initializing WhatsApp Bot")
         self.default_timeout = default_timeout
         self.session_timeout = session_timeout
+        self.schedule_engine = cron.ScheduleEngine()
+        self.config_file = settings.ConfigFile("config.json")
+        self._config_error = None
+        self.region_polygons = {}
         self._load_config()
         effective_user_data_dir = os.path.join(os.getcwd(), "cookies", user_data_dir or self.config.get("userdata_dir", ""))
         self.log.debug(f"Using user data directory: {effective_user_data_dir}")
@@ -93,16 +439,29 @@ class WhatsAppBot:
         self.log.info(f"Chrome PID: {self.pid}")
         self.driver.get("https://web.whatsapp.com")
         self.log.info("Navigating to WhatsApp Web")
-        self.latest_messages = None
-        self.latest_sender = None
-        self.latest_hour = None
-        self.session_caller = None
-        self.last_activity_time = None
-        self.last_scheduler_time = None
-        self.last_scheduler_task = list()
-        self.interactive_mode = False
-        self.scheduler_mode = False
-        self.module_found = False
+        self.current_chat = None
+        self._chat_rows = {}
+        self.inbox = deque()
+        self.steps = StepTimer()
+        self.sql_cache = QueryCache(self.log, self.config.get("sql_cache_size", 128))
+        self._sql_templates = {}
+        for cfg in self.keyword_sql.values():
+            try:
+                self._load_sql(cfg["sql_file"])
+            except OSError as e:
+                self.log.warning(f"Unable to preload SQL template {cfg['sql_file']}: {e}")
+        if self.config.get("preload_plugins", True):
+            plugins.preload([svc["python_path"] for svc in self.keyword_py.values()], self.log)
+        self.jobs = JobQueue(self.log, self.config.get("job_workers", 2))
+        self.throughput = ThroughputMeter(self.config.get("throughput_window", 300))
+        self.last_warm_time = 0
+        self.last_heartbeat_time = 0
+        self.render_stats = RenderStats()
+        self.staged = []
+        self.schedule_store = schedule_store.ScheduleStore(self.scheduler_options.get("state_db", "scheduler.db"))
+        self._render_local = threading.local()
+        self._render_lock = threading.Lock()
+        self._render_drivers = []
         try:
             self.log.debug("Waiting for WhatsApp Web to load")
             self.wait_for_presence('//div[@contenteditable="true"][@data-tab="3"]', timeout=120)
@@ -110,42 +469,143 @@ class WhatsAppBot:
         except TimeoutException:
             self.log.warning("Timeout waiting for WhatsApp Web to load")
             pass
-        self.log.info(f"Opening group: {self.config['groupname']}")
-        self.open_group(self.config["groupname"])
+        self.open_chat(next(iter(self.sessions)))
 
     def _load_config(self):
-        with open("config.json", "r", encoding="utf-8") as file:
-            self.config = json.load(file)
-        self.affirmative_keywords = self.config["affirmative_keywords"]
-        self.negative_keywords = self.config["negative_keywords"]
-        self.messages = self.config["messages"]
-        self.help_text = self.config["help_text"]
-        self.keyword = self.config["reporting_service"]
-        self.keyword_sql = self.config["sql_service"]
-        self.keyword_py = self.config["python_service"]
-        self.schedule = self.config["scheduler_service"]
-        self.max_consecutive_errors = self.config.get("max_consecutive_errors", 5)
-        self.restart_delay = self.config.get("restart_delay", 5)
-
-    def wait_for_presence(self, xpath, timeout: int = None):
+        """Reload config.json when it changes. A file that fails to parse or validate is rejected
+        and the last good config stays active; only the first load raises."""
+        try:
+            config = self.config_file.load()
+        except settings.ConfigError as e:
+            if not hasattr(self, "config"):
+                raise
+            if str(e) != self._config_error:
+                self._config_error = str(e)
+                self.log.error(f"Rejected config.json, keeping the previous config: {e}")
+            return
+        self._config_error = None
+        if config is None:
+            return
+        self.__dict__.update(self._derive_config(config))
+        if hasattr(self, "sql_cache"):
+            self.sql_cache.invalidate()
+        self._sync_groups()
+        dbpool.configure(**config.get("db_pool", {}))
+        ssrs.configure(**config.get("ssrs", {}))
+        self._apply_regions(config.get("regions", {}))
+        self._compile_schedule()
+        self.log.info("Loaded config.json")
+
+    def _apply_regions(self, polygons: dict):
+        """Swap in the region polygons from config.json and relabel the positions already held."""
+        if polygons == self.region_polygons:
+            return
+        import analytics, positions, regions  # imported on first use, off the startup path
+        if regions.configure(polygons):
+            positions.relabel()
+            analytics.clear()
+            self.log.info(f"Applied {len(polygons)} region polygon(s)")
+        self.region_polygons = polygons
+
+    def _derive_config(self, config: dict) -> dict:
+        """Everything the bot reads from config, computed up front so it can be swapped in at once."""
+        return {
+            "config": config,
+            "router": router.build(config),
+            "messages": config["messages"],
+            "help_text": config["help_text"],
+            "keyword": config["reporting_service"],
+            "keyword_sql": config["sql_service"],
+            "keyword_py": config["python_service"],
+            "schedule": config["scheduler_service"],
+            "max_consecutive_errors": config.get("max_consecutive_errors", 5),
+            "poll_interval": config.get("poll_interval", 0.5),
+            "refresh_suffix": config.get("refresh_suffix", "refresh"),
+            "waits": {**WAIT_DEFAULTS, **config.get("waits", {})},
+            "upload": {**UPLOAD_DEFAULTS, **config.get("upload", {})},
+            "report_pool": config.get("report_pool", {}),
+            "scheduler_options": config.get("scheduler_options", {}),
+            "restart_delay": config.get("restart_delay", 5),
+        }
+
+    def _sync_groups(self):
+        groups = self.config.get("groups") or [{"name": self.config["groupname"]}]
+        sessions = getattr(self, "sessions", {})
+        self.sessions = {}
+        for group in groups:
+            session = sessions.get(group["name"]) or GroupSession(group["name"])
+            commands = [router.normalize(command) for command in group["commands"]] if "commands" in group else None
+            session.commands = {c for c in commands if not c.endswith(" *")} if commands is not None else None
+            session.command_prefixes = tuple(c[:-1] for c in commands or [] if c.endswith(" *"))
+            session.schedule = group.get("scheduler", self.schedule)
+            session.max_sessions = group.get("max_sessions", self.config.get("max_sessions", 5))
+            self.sessions[session.name] = session
+
+    def _compile_schedule(self):
+        entries = [(session.name, spec, commands) for session in self.sessions.values()
+                   for spec, commands in session.schedule.items()]
+        shifts = self.scheduler_options.get("shifts", {})
+        key = json.dumps([entries, shifts, self.scheduler_options.get("lead_time", {})])
+        if not self.schedule_engine.build(key, entries, self.lead_time, shifts):
+            return
+        for error in self.schedule_engine.errors:
+            self.log.error(f"Ignoring invalid schedule entry {error}")
+        self.log.info(f"Compiled {len(self.schedule_engine.triggers)} schedule entries, next event in "
+                      f"{self.schedule_engine.seconds_until_next():.0f}s")
+
+    def wait_for_presence(self, xpath, timeout: int = None, driver=None):
         t = timeout or self.default_timeout
-        return WebDriverWait(self.driver, t).until(EC.presence_of_element_located((By.XPATH, xpath)))
+        return WebDriverWait(driver or self.driver, t).until(EC.presence_of_element_located((By.XPATH, xpath)))
 
-    def wait_for_visibility(self, xpath, timeout: int = None):
+    def wait_for_visibility(self, xpath, timeout: int = None, driver=None):
         t = timeout or self.default_timeout
-        return WebDriverWait(self.driver, t).until(EC.visibility_of_element_located((By.XPATH, xpath)))
+        return WebDriverWait(driver or self.driver, t).until(EC.visibility_of_element_located((By.XPATH, xpath)))
 
-    def wait_for_clickable(self, xpath, timeout: int = None):
+    def wait_for_clickable(self, xpath, timeout: int = None, driver=None):
         t = timeout or self.default_timeout
-        return WebDriverWait(self.driver, t).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+        return WebDriverWait(driver or self.driver, t).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+
+    def wait_until(self, step, condition, timeout: float = None, driver=None, poll: float = None):
+        bound = timeout or self.waits.get(step, self.default_timeout)
+        with self.steps.measure(step):
+            try:
+                return WebDriverWait(driver or self.driver, bound, poll_frequency=poll or self.waits["poll"]).until(condition)
+            except TimeoutException:
+                self.log.warning(f"'{step}' not ready after {bound}s, continuing")
+                return None
+
+    def wait_network_idle(self, timeout: float = None, driver=None):
+        quiet = self.waits["network_quiet"]
+        state = {"count": None, "since": time.time()}
+        def idle(d):
+            ready, count = d.execute_script(NETWORK_STATE_JS)
+            now = time.time()
+            if not ready or count != state["count"]:
+                state["count"], state["since"] = count, now
+                return False
+            return now - state["since"] >= quiet
+        return self.wait_until("network_idle", idle, timeout, driver)
+
+    def wait_size_stable(self, element, timeout: float = None, driver=None):
+        state = {"rect": None}
+        def stable(_):
+            rect = element.rect
+            settled = rect == state["rect"] and rect["width"] > 0 and rect["height"] > 0
+            state["rect"] = rect
+            return settled
+        return self.wait_until("size_stable", stable, timeout, driver, poll=self.waits["stable_interval"])
 
     def human_type(self, element, text: str):
+        low, high = self.waits["typing_delay"]
+        if high <= 0:
+            element.send_keys(text)
+            return
         words = text.split(' ')
         for i, word in enumerate(words):
             element.send_keys(word)
             if i < len(words) - 1:
                 element.send_keys(' ')
-            time.sleep(random.uniform(0.05, 0.15))
+            time.sleep(random.uniform(low, high))
 
     def open_group(self, group_name: str):
         self.log.debug(f"Opening group: {group_name}")
@@ -161,14 +621,62 @@ class WhatsAppBot:
         self.wait_for_clickable(f'//div[@contenteditable="true"][@data-tab="10"]').click()
         self.log.success(f"Successfully opened group: {group_name}")
 
+    def open_chat(self, name: str):
+        if self.current_chat == name:
+            return
+        if self.current_chat is not None:
+            self.drain_messages()
+        unread = self.driver.execute_script(UNREAD_CHATS_JS, [name]).get(name, 0)
+        self.log.debug(f"Switching chat to: {name} ({unread} unread)")
+        with self.steps.measure("open_chat"):
+            try:
+                self._chat_rows[name].click()
+            except (KeyError, StaleElementReferenceException, WebDriverException):
+                try:
+                    row = self.driver.find_element(By.XPATH, f'//div[@id="pane-side"]//span[@title="{name}"]')
+                    row.click()
+                except (NoSuchElementException, WebDriverException):
+                    self.open_group(name)
+                    row = self.driver.find_element(By.XPATH, f'//div[@id="pane-side"]//span[@title="{name}"]')
+                self._chat_rows[name] = row
+            self.wait_until("chat_open", EC.presence_of_element_located((By.XPATH, f'//div[@id="main"]//header//span[@title="{name}"]')))
+        self.current_chat = name
+        self.drain_messages(unread)
+
+    def _parse_bubble(self, text):
+        parts = text.split("\n")
+        sender = parts[0] if len(parts) == 3 else 'Bapak/Ibu'
+        message = parts[1] if len(parts) == 3 else parts[0]
+        hour = parts[2] if len(parts) == 3 else parts[-1]
+        return sender, message, hour
+
+    def drain_messages(self, backlog: int = 0):
+        batch = self.driver.execute_script(MESSAGE_INTAKE_JS, backlog)
+        if batch is None:
+            raise Exception("Chat pane not found, message observer not installed")
+        for item in batch:
+            sender, message, hour = self._parse_bubble(item["text"])
+            self.inbox.append((self.current_chat, sender, message, hour))
+        if batch:
+            self.log.debug(f"Received {len(batch)} new message(s) in {self.current_chat}, {len(self.inbox)} in inbox")
+
     def get_message(self):
-        self.wait_for_presence('//div[contains(@class,"message-in")]')
-        messages = self.driver.find_elements(By.XPATH, '//div[contains(@class,"message-in")]')[-1]
-        parts = messages.text.split("\n")
-        last_sender = parts[0] if len(parts) == 3 else 'Bapak/Ibu'
-        last_messages = parts[1] if len(parts) == 3 else parts[0]
-        last_hour = parts[2] if len(parts) == 3 else parts[1]
-        return last_sender, last_messages, last_hour
+        if not self.inbox:
+            self.drain_messages()
+        if not self.inbox and len(self.sessions) > 1:
+            others = [name for name in self.sessions if name != self.current_chat]
+            unread = self.driver.execute_script(UNREAD_CHATS_JS, others)
+            if unread:
+                self.open_chat(next(iter(unread)))
+        while self.inbox:
+            chat, sender, message, hour = self.inbox.popleft()
+            if chat in self.sessions:
+                return self.sessions[chat], sender, message, hour
+        return None, None, None, None
+
+    def reply(self, session: GroupSession, message, is_multiline: bool = False):
+        self.open_chat(session.name)
+        self.send_message(message, is_multiline)
 
     def send_message(self, message, is_multiline: bool = False):
         self.log.debug(f"Sending message: {'[MULTILINE]' if is_multiline else message}")
@@ -182,12 +690,12 @@ class WhatsAppBot:
         else:
             self.human_type(input_box, message)
             input_box.send_keys(Keys.ENTER)
+        self.wait_until("message_sent", lambda _: not input_box.text.strip())
         self.log.success("Message sent successfully")
 
     def image_to_base64(self, image_path: str) -> str:
         self.log.debug(f"Converting image to base64: {image_path}")
         with open(image_path, "rb") as image_file:
-            import base64
             encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
         return encoded_string
 
@@ -205,58 +713,85 @@ class WhatsAppBot:
             self.log.debug(f"Error enabling HD quality: {str(e)}, skipping")
             pass
 
+    def compress_image(self, image_path: str) -> str:
+        cfg = self.upload.get("recompress") or {}
+        size = os.path.getsize(image_path)
+        if not cfg or size < cfg.get("min_bytes", 1024 * 1024):
+            return image_path
+        fmt = cfg.get("format", "png").lower()
+        base, _ = os.path.splitext(image_path)
+        out_path = f"{base}_upload.{'jpg' if fmt == 'jpeg' else fmt}"
+        with self.steps.measure("recompress"), Image.open(image_path) as img:
+            rgb = img.convert("RGB")
+            if fmt == "png":
+                if rgb.getcolors(256) is None:
+                    return image_path
+                pixels = np.asarray(rgb).astype(np.uint32)
+                packed = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+                colors, indices = np.unique(packed, return_inverse=True)
+                indexed = Image.fromarray(indices.reshape(packed.shape).astype(np.uint8), mode="P")
+                indexed.putpalette(np.stack([colors >> 16, colors >> 8, colors], axis=1).astype(np.uint8).tobytes())
+                indexed.save(out_path, "PNG")
+            else:
+                rgb.save(out_path, fmt.upper(), quality=cfg.get("quality", 85))
+        compressed = os.path.getsize(out_path)
+        if compressed >= size:
+            os.remove(out_path)
+            return image_path
+        self.log.debug(f"Recompressed {image_path}: {size / 1024:.0f} KB -> {compressed / 1024:.0f} KB ({fmt})")
+        return out_path
+
     def send_image(self, image_path: str, caption: str):
         self.log.debug(f"Sending image: {image_path} with caption: {caption}")
-        encoded_string = self.image_to_base64(image_path)
-        input_box = self.wait_for_visibility(f'//div[@contenteditable="true"][@data-tab="10"]')
-        input_box.click()
-        
-        js_script = f"""
-        var dataTransfer = new DataTransfer();
-        var blob = new Blob([Uint8Array.from(atob('{encoded_string}'), c => c.charCodeAt(0))], {{type: 'image/png'}});
-        var file = new File([blob], '{os.path.basename(image_path)}', {{type: 'image/png'}});
-        dataTransfer.items.add(file);
-        
-        var pasteEvent = new ClipboardEvent('paste', {{
-            clipboardData: dataTransfer,
-            bubbles: true,
-            cancelable: true
-        }});
-        
-        var element = arguments[0];
-        element.dispatchEvent(pasteEvent);
-        """
-        
-        self.log.debug(f"Executing JavaScript paste event for {image_path}")
-        self.driver.execute_script(js_script, input_box)
-        time.sleep(3)
-        caption_box = self.wait_for_clickable(f'//div[@contenteditable="true"][@role="textbox"]')
-        caption_box.click()
-        for row in caption:
-            self.log.debug(f"Send {row}")
-            caption_box.send_keys(row)
-            caption_box.send_keys(Keys.SHIFT, Keys.ENTER)
-        self.enable_hd_quality()
-        caption_box.send_keys(Keys.ENTER)
+        started = time.time()
+        upload_path = self.compress_image(image_path)
+        try:
+            input_box = self.wait_for_visibility(f'//div[@contenteditable="true"][@data-tab="10"]')
+            input_box.click()
+            if self.upload.get("mode") == "file_input":
+                with self.steps.measure("file_input"):
+                    self.wait_for_clickable(self.upload["attach_xpath"]).click()
+                    self.wait_for_presence(self.upload["file_input_xpath"]).send_keys(os.path.abspath(upload_path))
+            else:
+                with self.steps.measure("paste"):
+                    mime_type = mimetypes.guess_type(upload_path)[0] or "image/png"
+                    self.driver.execute_script(PASTE_IMAGE_JS, input_box, self.image_to_base64(upload_path),
+                                               os.path.basename(upload_path), mime_type)
+            self.wait_until("attachment_preview", EC.visibility_of_element_located((By.XPATH, self.waits["preview_xpath"])))
+            self.log.debug(f"Uploaded {upload_path} ({os.path.getsize(upload_path) / 1024:.0f} KB) "
+                           f"via {self.upload.get('mode', 'paste')} in {time.time() - started:.2f}s")
+            caption_box = self.wait_for_clickable(f'//div[@contenteditable="true"][@role="textbox"]')
+            caption_box.click()
+            for row in caption:
+                self.log.debug(f"Send {row}")
+                caption_box.send_keys(row)
+                caption_box.send_keys(Keys.SHIFT, Keys.ENTER)
+            self.enable_hd_quality()
+            caption_box.send_keys(Keys.ENTER)
+        finally:
+            if upload_path != image_path:
+                os.remove(upload_path)
         self.log.success("Image sent successfully")
 
-    def open_new_tab(self, url=None):
+    def open_new_tab(self, url=None, driver=None):
+        driver = driver or self.driver
         self.log.debug(f"Open url in new tab: {url}")
-        self.driver.execute_script("window.open('');")
-        self.driver.switch_to.window(self.driver.window_handles[-1])
+        driver.execute_script("window.open('');")
+        driver.switch_to.window(driver.window_handles[-1])
         if url:
-            self.driver.get(url)
-        return self.driver.window_handles[-1]
+            driver.get(url)
+        return driver.window_handles[-1]
 
-    def switch_tab(self, tab_handle):
+    def switch_tab(self, tab_handle, driver=None):
         self.log.debug(f"Switch tab to: {tab_handle}")
-        self.driver.switch_to.window(tab_handle)
+        (driver or self.driver).switch_to.window(tab_handle)
 
-    def close_current_tab(self):
+    def close_current_tab(self, driver=None):
+        driver = driver or self.driver
         self.log.debug(f"Closing new tab")
-        self.driver.close()
-        if len(self.driver.window_handles) > 0:
-            self.driver.switch_to.window(self.driver.window_handles[0])
+        driver.close()
+        if len(driver.window_handles) > 0:
+            driver.switch_to.window(driver.window_handles[0])
 
     def getdate(self):
         self.log.debug(f"Generating current date")
@@ -266,120 +801,604 @@ class WhatsAppBot:
         previous_day = now - timedelta(days=1)
         return previous_day.strftime("%Y-%m-%d")
 
-    def input_parameter(self, last_messages):
+    def _parameter_value(self, param):
+        return self.getdate() if param["value"] == "getdate" else param["value"]
+
+    def set_checkbox(self, element, checked: bool, driver=None) -> bool:
+        return (driver or self.driver).execute_script(SET_CHECKBOX_JS, element, checked)
+
+    def input_parameter(self, last_messages, driver=None, params=None, applied=None):
+        driver = driver or self.driver
+        params = self.keyword[last_messages]["parameter"] if params is None else params
         self.log.debug(f"Input parameter to: {last_messages}")
-        for param in self.keyword[last_messages]["parameter"]:
+        wanted = {param["xpath"] for param in params}
+        for param in applied or []:
+            if param["type"] == "select" and param["xpath"] not in wanted:
+                for element in driver.find_elements(By.XPATH, param["xpath"]):
+                    if self.set_checkbox(element, False, driver):
+                        self.log.debug(f"Cleared parameter: {param['name']}")
+        for param in params:
             if param["type"] == "text_input":
+                input_box = self.wait_for_visibility(param['xpath'], driver=driver)
+                value = self._parameter_value(param)
+                if applied is not None and input_box.get_attribute("value") == value:
+                    continue
                 self.log.debug(f"Input parameter to: {param['name']}")
-                input_box = self.wait_for_visibility(param['xpath'])
                 input_box.click()
                 input_box.send_keys(Keys.CONTROL + "a")
                 input_box.send_keys(Keys.DELETE)
-                value = param['value']
-                if value == "getdate":
-                    value = self.getdate()
                 input_box.send_keys(value)
             elif param["type"] == "select":
                 self.log.debug(f"Input parameter to: {param['name']}")
-                select_box = self.wait_for_clickable(param['xpath'])
-                select_box.click()
+                select_box = self.wait_for_presence(param['xpath'], driver=driver)
+                if not self.set_checkbox(select_box, True, driver):
+                    self.wait_for_clickable(param['xpath'], driver=driver).click()
+        return list(params)
 
-    def take_screenshot(self, last_messages):
-        element = self.wait_for_visibility(self.keyword[last_messages]["body"])
+    def take_screenshot(self, last_messages, driver=None):
+        driver = driver or self.driver
+        element = self.wait_for_visibility(self.keyword[last_messages]["body"], driver=driver)
         self.log.debug(f"Resizing windows")
-        self.driver.set_window_size(self.keyword[last_messages]["width"], self.keyword[last_messages]["height"])
-        time.sleep(5)
-        picture_name = self.driver.current_window_handle + '.png'
+        driver.set_window_size(self.keyword[last_messages]["width"], self.keyword[last_messages]["height"])
+        self.wait_size_stable(element, driver=driver)
+        picture_name = f"{uuid.uuid4().hex}.png"
         self.log.debug(f"Taking Screenshot: {picture_name}")
         element.screenshot(picture_name)
-        if not self.config.get("headless", False):
-            self.driver.maximize_window()
+        if driver is self.driver and not self.config.get("headless", False):
+            driver.maximize_window()
         else:
-            self.driver.set_window_size(1920, 1080)        
+            driver.set_window_size(1920, 1080)
         return picture_name
-    
+
+    def _render_driver(self):
+        driver = getattr(self._render_local, "driver", None)
+        if driver is not None:
+            return driver
+        with self._render_lock:
+            index = len(self._render_drivers)
+            options = Options()
+            for arg in self.options.arguments:
+                if not arg.startswith("user-data-dir") and arg != "--start-maximized":
+                    options.add_argument(arg)
+            options.add_argument("--headless")
+            options.add_argument("--window-size=1920,1080")
+            render_dir = os.path.join(os.getcwd(), "cookies", f"{self.config.get('userdata_dir', '')}_render_{index}")
+            options.add_argument(rf"user-data-dir={render_dir}")
+            self.log.info(f"Starting render WebDriver #{index}")
+            driver = webdriver.Chrome(options=options)
+            self._render_drivers.append(driver)
+        self._render_local.driver = driver
+        return driver
+
+    def _report_tab(self, driver, url: str) -> ReportTab:
+        tabs = self._render_local.__dict__.setdefault("report_tabs", {})
+        tab = tabs.get(url)
+        if tab is not None and tab.handle not in driver.window_handles:
+            tabs.pop(url)
+            tab = None
+        if tab is None:
+            with self.steps.measure("report_load"):
+                tab = tabs[url] = ReportTab(self.open_new_tab(url, driver=driver), url)
+            return tab
+        self.switch_tab(tab.handle, driver=driver)
+        if time.time() - tab.loaded_at > self.report_pool.get("max_age", 900):
+            self.log.debug(f"Reloading report tab: {url}")
+            with self.steps.measure("report_load"):
+                driver.get(url)
+            tab.applied = []
+            tab.loaded_at = time.time()
+        return tab
+
+    def _drop_report_tab(self, driver, tab: ReportTab):
+        self._render_local.__dict__.get("report_tabs", {}).pop(tab.url, None)
+        try:
+            self.switch_tab(tab.handle, driver=driver)
+            self.close_current_tab(driver=driver)
+        except WebDriverException:
+            pass
+
+    def common_parameters(self, url: str) -> list:
+        reports = [cfg["parameter"] for cfg in self.keyword.values() if cfg["url"] == url]
+        return [param for param in reports[0] if all(param in params for params in reports[1:])]
+
+    def warm_reports(self):
+        driver = self._render_driver()
+        for url in dict.fromkeys(cfg["url"] for cfg in self.keyword.values() if cfg.get("mode") != "url_access"):
+            tab = self._report_tab(driver, url)
+            if tab.applied:
+                continue
+            try:
+                params = []
+                for param in self.common_parameters(url):
+                    if param["type"] == "select":
+                        elements = driver.find_elements(By.XPATH, param["xpath"])
+                        if not elements or elements[0].get_attribute("type") != "checkbox":
+                            continue
+                    params.append(param)
+                tab.applied = self.input_parameter(url, driver=driver, params=params, applied=[])
+                self.wait_network_idle(driver=driver)
+                self.log.debug(f"Warmed report tab {url} with {len(params)} common parameter(s)")
+            except Exception as e:
+                self.log.warning(f"Unable to warm report tab {url}: {e}")
+                self._drop_report_tab(driver, tab)
+
+    def render_report(self, command):
+        cfg = self.keyword[command]
+        if cfg.get("mode") == "url_access":
+            try:
+                return self._timed_render("url_access", self.export_report, command)
+            except Exception as e:
+                if not cfg["export"].get("fallback", True):
+                    raise
+                self.log.warning(f"URL export of '{command}' failed ({e}), falling back to browser rendering")
+        return self._timed_render("browser", self._render_report_browser, command)
+
+    def _timed_render(self, mode, render, command):
+        started = time.time()
+        ok = False
+        try:
+            result = render(command)
+            ok = True
+            return result
+        finally:
+            self.render_stats.record(mode, time.time() - started, ok)
+            self.log.debug(f"Report render stats: {self.render_stats.summary()}")
+
+    def export_report(self, command):
+        cfg = self.keyword[command]
+        export = cfg["export"]
+        parameters = {name: [self.getdate() if item == "getdate" else item for item in value]
+                      if isinstance(value, list) else self.getdate() if value == "getdate" else value
+                      for name, value in export.get("parameters", {}).items()}
+        picture_name = f"{uuid.uuid4().hex}.png"
+        with self.steps.measure("export"):
+            ssrs.export(export["url"], parameters, picture_name, export.get("format", "IMAGE"),
+                        export.get("device_info", {"OutputFormat": "PNG"}), export.get("timeout"))
+        caption = export.get("caption", cfg["caption"])
+        if caption == "xpath":
+            caption = f"*{command}* "
+        return picture_name, (caption + self.getdate()).splitlines()
+
+    def _render_report_browser(self, command):
+        driver = self._render_driver()
+        cfg = self.keyword[command]
+        if not self.report_pool.get("enabled", True):
+            new_tab = self.open_new_tab(cfg["url"], driver=driver)
+            self.switch_tab(new_tab, driver=driver)
+            try:
+                with self.steps.measure("input_parameter"):
+                    self.input_parameter(command, driver=driver)
+                return self._capture_report(command, driver)
+            finally:
+                self.close_current_tab(driver=driver)
+        tab = self._report_tab(driver, cfg["url"])
+        try:
+            previous = driver.find_elements(By.XPATH, cfg["detection"])
+            with self.steps.measure("input_parameter"):
+                tab.applied = self.input_parameter(command, driver=driver, applied=tab.applied)
+            if previous:
+                self.wait_until("report_rerender", EC.staleness_of(previous[0]), driver=driver)
+            return self._capture_report(command, driver)
+        except Exception:
+            self._drop_report_tab(driver, tab)
+            raise
+
+    def _capture_report(self, command, driver):
+        cfg = self.keyword[command]
+        self.wait_network_idle(driver=driver)
+        with self.steps.measure("detection"):
+            detection = self.wait_for_visibility(cfg["detection"], 120, driver=driver)
+        detection.click()
+        if cfg["caption"] == "xpath":
+            caption_text = self.wait_for_visibility("//*[contains(text(), 'captionbox')]", driver=driver)
+            caption = caption_text.text.strip()
+        else:
+            caption = cfg["caption"] + self.getdate()
+        caption_list = [line for line in caption.splitlines() if "captionbox" not in line.lower()]
+        filename = self.take_screenshot(command, driver=driver)
+        return filename, caption_list
+
+    def render_html(self, command, method_name=None):
+        html_path, caption = self.execute_python(command, method_name)
+        driver = self._render_driver()
+        svc = self.keyword_py[command]
+        driver.set_window_size(svc["width"], svc["height"])
+        self.log.debug(f"Opening HTML file in new tab: {html_path} ({os.path.getsize(html_path) / 1024:.0f} KB)")
+        started = time.time()
+        new_tab = self.open_new_tab(f"file:///{os.path.abspath(html_path).replace(os.sep, '/')}", driver=driver)
+        self.switch_tab(new_tab, driver=driver)
+        try:
+            self.wait_network_idle(driver=driver)
+            picture_name = f"{uuid.uuid4().hex}.png"
+            element = self.wait_for_visibility("/html/body", driver=driver)
+            self.wait_size_stable(element, driver=driver)
+            element.screenshot(picture_name)
+            driver.set_window_size(1920, 1080)
+        finally:
+            self.close_current_tab(driver=driver)
+        self.log.debug(f"Rendered {html_path} to {picture_name} in {time.time() - started:.1f}s")
+        os.remove(html_path)
+        return picture_name, caption
+
     def _load_sql(self, file_path):
+        mtime = os.path.getmtime(file_path)
+        cached = self._sql_templates.get(file_path)
+        if cached and cached[0] == mtime:
+            return cached
+        self.log.debug(f"Loading SQL template: {file_path}")
         with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+            query = f.read()
+        self._sql_templates[file_path] = (mtime, query)
+        return mtime, query
         
-    def _connect(self, server, database, timeout):
-        conn_str = (
-            "Driver={SQL Server};"
-            f"Server={server};"
-            f"Database={database};"
-            "Trusted_Connection=yes;")
-        return pyodbc.connect(conn_str, timeout=timeout)
-    
-    def execute_sql(self, command_key, values, timeout=120):
+    def execute_sql(self, command_key, values, timeout=120, force_refresh=False):
         cfg = self.config["sql_service"][command_key]
         param_names = cfg.get("params", [])
         self.log.debug(f"Checking parameters for command '{command_key}': expected {param_names}, got {values}")
         if len(param_names) != len(values):
             return [f"Maaf parameter yang anda cari tidak ditemukan/salah. Command ini membutuhkan {len(param_names)} parameter, sedangkan anda memberikan {len(values)} parameter"]
 
+        mtime, query = self._load_sql(cfg["sql_file"])
+        cache_key = (command_key, tuple(values), mtime)
+        if force_refresh:
+            self.log.debug(f"Force refresh requested for {cache_key}")
+            self.sql_cache.invalidate(cache_key)
+        else:
+            cached = self.sql_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         params = dict(zip(param_names, values))
-        query = self._load_sql(cfg["sql_file"]).format(**params)
-        with self._connect(cfg["server"], cfg["database"], timeout) as conn:
+        with dbpool.connection(cfg["server"], cfg["database"]) as conn:
+            conn.timeout = timeout
             with conn.cursor() as cursor:
                 self.log.debug(f"Executing SQL command: {command_key} with params: {params}")
-                cursor.execute(query)
+                cursor.execute(query, *values)
                 row = cursor.fetchone()
                 self.log.success(f"Successfully executed SQL command: {command_key}")
                 if row and row[0] and row[0].strip():
-                    return [item.strip() for item in row[0].split(';') if item.strip()]
+                    result = [item.strip() for item in row[0].split(';') if item.strip()]
+                    self.sql_cache.put(cache_key, result, cfg.get("cache_ttl", 60))
+                    return result
                 self.log.warning(f"No data found for command '{command_key}' with params {params}")
                 return ["Maaf parameter yang anda cari tidak ditemukan/salah"]
     
-    def execute_python(self, command_key):
+    def execute_python(self, command_key, method_name=None):
         svc = self.keyword_py.get(command_key)
         if not svc:
-            self.send_message(f"Service '{command_key}' not found in config")
-            return None
+            raise ServiceError(f"Service '{command_key}' not found in config")
 
-        module_path = os.path.abspath(svc["python_path"])
-        module_name = os.path.splitext(os.path.basename(module_path))[0]
-        spec = importlib.util.spec_from_file_location(module_name, module_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
         class_name = svc.get("class_name", None)
-        method_name = svc.get("method", None)
+        method_name = method_name or svc.get("method", None)
         if not class_name or not method_name:
-            self.send_message(f"Service '{command_key}' must define 'class_name' and 'method'")
+            raise ServiceError(f"Service '{command_key}' must define 'class_name' and 'method'")
+        try:
+            with self.steps.measure("load_module"):
+                instance, lock = plugins.get_instance(svc["python_path"], class_name, svc["parameter"],
+                                                      keep=svc.get("keep_instance", False))
+        except FileNotFoundError:
+            raise ServiceError(f"Maaf module untuk service '{command_key}' tidak ditemukan/salah")
+        with lock:
+            return getattr(instance, method_name)()
+
+    def render_python(self, command, force_refresh=False):
+        import analytics
+        with analytics.memo_scope(refresh=force_refresh):
+            return self._render_python(command)
+
+    def _render_python(self, command):
+        svc = self.keyword_py[command]
+        try:
+            if svc.get("output_type") == "html":
+                return self.render_html(command)
+            return self.execute_python(command)
+        except ServiceError:
+            raise
+        except Exception as e:
+            fallback = svc.get("fallback")
+            if not fallback:
+                raise
+            self.log.warning(f"Service '{command}' failed ({e}), falling back to '{fallback['method']}' ({fallback.get('output_type', 'image')})")
+            if fallback.get("output_type") == "html":
+                return self.render_html(command, fallback["method"])
+            return self.execute_python(command, fallback["method"])
+
+    def command_job(self, session: GroupSession, command: str, force_refresh: bool = False):
+        route = self.router.route(command) if command else None
+        if route is None or route.handler.kind is None or not session.allows(route.name):
             return None
-        
-        cls = getattr(module, class_name)
-        instance = cls(**svc["parameter"])
-        method = getattr(instance, method_name)
-        self.module_found = True
-        return method()
+        return route.handler.kind, route.handler.build(self, route.args, force_refresh)
+
+    def submit_job(self, command, kind, build, sessions, sender, post_at=None, commands=None, slot=None):
+        def timed_build():
+            import analytics
+            self.steps.start()
+            try:
+                job.token = self.freshness_token(job.commands)
+                with analytics.memo_scope(run=job.slot):
+                    return build()
+            finally:
+                job.steps = self.steps.collect()
+        job = Job(command, kind, sender, timed_build, sessions, post_at)
+        job.source_build = build
+        job.commands = commands or []
+        job.slot = slot or post_at
+        if job.slot:
+            for session in sessions:
+                for scheduled_command in job.commands:
+                    self.schedule_store.claim(job.slot, scheduled_command, session.name, job.id)
+        position = self.jobs.submit(job)
+        if job.sender != "system_scheduler":
+            for session in sessions:
+                self.reply(session, self.messages["processing"].format(command=command))
+                if position > self.jobs.workers:
+                    self.reply(session, self.messages["queued"].format(command=command, position=position - self.jobs.workers))
+        return job
+
+    def freshness_token(self, commands):
+        checks = self.scheduler_options.get("freshness", {})
+        token = []
+        for command in commands:
+            check = checks.get(command)
+            if not check:
+                continue
+            try:
+                with dbpool.connection(check["server"], check["database"]) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(check["sql"])
+                    row = cursor.fetchone()
+                    cursor.close()
+            except Exception as e:
+                self.log.warning(f"Freshness check for '{command}' failed: {e}")
+                return None
+            token.append((command, tuple(row) if row else None))
+        return token
+
+    def _images(self, job):
+        if job.kind not in ("image", "images") or not job.result:
+            return []
+        return [job.result] if job.kind == "image" else job.result
+
+    def stage(self, job):
+        staging_dir = self.scheduler_options.get("staging_dir", "staging")
+        os.makedirs(staging_dir, exist_ok=True)
+        staged = []
+        for image_path, caption in self._images(job):
+            staged_path = os.path.join(staging_dir, f"{job.post_at:%Y%m%d_%H%M}_{job.id}_{os.path.basename(image_path)}")
+            os.replace(image_path, staged_path)
+            staged.append((staged_path, caption))
+        if staged:
+            job.result = staged[0] if job.kind == "image" else staged
+        self.staged.append(job)
+        for session in job.sessions:
+            for command in job.commands:
+                self.schedule_store.mark(job.slot, command, session.name, "staged", job.id)
+        self.log.info(f"Staged '{job.command}' for {job.post_at:%H:%M}, "
+                      f"ready {(job.post_at - datetime.now()).total_seconds():.0f}s early")
+
+    def post_staged(self):
+        now = datetime.now()
+        for job in [job for job in self.staged if job.post_at <= now]:
+            self.staged.remove(job)
+            self._guarded_deliver(job, self._post_staged_job)
+
+    def _post_staged_job(self, job):
+        if job.commands and job.token is not None and job.rebuilds < self.scheduler_options.get("max_rebuilds", 1):
+            token = self.freshness_token(job.commands)
+            if token is not None and token != job.token:
+                self.log.info(f"Source of '{job.command}' changed since it was staged, re-rendering")
+                self._remove_images(job)
+                rebuilt = self.submit_job(job.command, job.kind, job.source_build, job.sessions, job.sender,
+                                          post_at=job.post_at, commands=job.commands, slot=job.slot)
+                rebuilt.rebuilds = job.rebuilds + 1
+                return
+        self._deliver(job)
+
+    def _guarded_deliver(self, job, step=None):
+        try:
+            (step or self._deliver)(job)
+        except Exception as e:
+            self._fail_job(job, e)
+
+    def _fail_job(self, job, error):
+        """Last resort for a job whose delivery raised: tell its groups and keep the loop running."""
+        self.log.error(f"Failed to deliver '{job.command}' from {job.sender}: {error}")
+        self.log.debug(f"Traceback details:\n{traceback.format_exc()}")
+        for session in job.sessions:
+            if job.slot:
+                for command in job.commands:
+                    if self.schedule_store.status(job.slot, command, session.name) != "sent":
+                        self.schedule_store.mark(job.slot, command, session.name, "failed", job.id)
+            try:
+                self.reply(session, f"Gagal memproses perintah '{job.command}'. Silakan coba lagi nanti.")
+                if job.sender != "system_scheduler":
+                    self.reply(session, self.messages["confirmation"].format(user=job.sender))
+            except Exception as e:
+                self.log.warning(f"Unable to report the failure of '{job.command}' to {session.name}: {e}")
+        try:
+            self._remove_images(job)
+        except OSError as e:
+            self.log.warning(f"Unable to remove images of '{job.command}': {e}")
+
+    def _remove_images(self, job):
+        for image_path, _ in self._images(job):
+            if os.path.exists(image_path):
+                os.remove(image_path)
+
+    def deliver_jobs(self):
+        for job in self.jobs.completed():
+            if job.kind == "warmup":
+                if job.error:
+                    self.log.warning(f"Report tab warm-up failed: {job.error}")
+                continue
+            if job.post_at and datetime.now() < job.post_at:
+                if not job.error:
+                    self._guarded_deliver(job, self.stage)
+                    continue
+                if job.rebuilds < self.scheduler_options.get("max_rebuilds", 1):
+                    self.log.warning(f"Scheduled '{job.command}' failed before its {job.post_at:%H:%M} slot, retrying: {job.error}")
+                    retry = self.submit_job(job.command, job.kind, job.source_build, job.sessions, job.sender,
+                                            post_at=job.post_at, commands=job.commands, slot=job.slot)
+                    retry.rebuilds = job.rebuilds + 1
+                    continue
+            self._guarded_deliver(job)
+        self.post_staged()
+        if not self.jobs.pending and not self.staged:
+            [os.remove(f) for f in glob.glob("templates/asset/*") if os.path.isfile(f)]
+
+    def _deliver(self, job):
+        send_started = time.time()
+        self.steps.start()
+        for session in job.sessions:
+            if job.slot and all(self.schedule_store.status(job.slot, command, session.name) == "sent"
+                                for command in job.commands):
+                self.log.info(f"'{job.command}' for {job.slot:%Y-%m-%d %H:%M} was already sent to {session.name}, skipping")
+                continue
+            status = "failed"
+            try:
+                if job.error:
+                    raise job.error
+                if job.slot and not job.post_at and self.messages.get("catch_up"):
+                    self.reply(session, self.messages["catch_up"].format(command=job.command, slot=f"{job.slot:%d/%m %H:%M}"))
+                if job.kind in ("image", "images"):
+                    self.open_chat(session.name)
+                    for image_path, caption in self._images(job):
+                        self.send_image(image_path, caption)
+                else:
+                    self.reply(session, job.result, is_multiline=True)
+                status = "sent"
+                self.log.success(f"Successfully processed request: {job.command} ({session.name})")
+            except ServiceError as e:
+                self.reply(session, str(e))
+            except Exception as e:
+                self.log.error(f"Failed to process command '{job.command}' from {job.sender} in {session.name}: {e}")
+                self.log.debug(f"Traceback details:\n{job.traceback or traceback.format_exc()}")
+                self.reply(session, f"Gagal memproses perintah '{job.command}'. Silakan coba lagi nanti.")
+            if job.slot:
+                for command in job.commands:
+                    self.schedule_store.mark(job.slot, command, session.name, status, job.id)
+            if job.sender != "system_scheduler": self.reply(session, self.messages["confirmation"].format(user=job.sender))
+            if job.sender in session.users:
+                session.users[job.sender].last_activity_time = time.time()
+        self._remove_images(job)
+        done = time.time()
+        job.steps += self.steps.collect()
+        self.log.info(f"Job {job.id} '{job.command}' latency: wait {job.started_at - job.created_at:.1f}s, "
+                      f"build {job.finished_at - job.started_at:.1f}s, send {done - send_started:.1f}s "
+                      f"to {len(job.sessions)} group(s), total {done - job.created_at:.1f}s")
+        if job.post_at:
+            self.log.info(f"Job {job.id} '{job.command}' posted {(datetime.now() - job.post_at).total_seconds():.0f}s "
+                          f"after its {job.post_at:%H:%M} slot")
+        if job.steps:
+            self.log.debug(f"Job {job.id} steps: " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in job.steps))
+        self.throughput.record(job.sender)
+        rate, senders = self.throughput.rate()
+        self.log.info(f"Throughput: {rate:.1f} commands/min from {senders} sender(s) "
+                      f"over the last {self.throughput.window / 60:.0f} min")
+
+    def lead_time(self, command: str) -> float:
+        lead_times = self.scheduler_options.get("lead_time", {})
+        return lead_times.get(command, lead_times.get("default", 0))
 
     def scheduler(self):
         now = datetime.now()
-        for schedule_time, commands in self.schedule.items():
-            schedule_dt = datetime.strptime(schedule_time, "%H:%M").replace(year=now.year, month=now.month, day=now.day)
-            if schedule_dt <= now <= schedule_dt + timedelta(minutes=10):
-                self.scheduler_mode = True
-                if self.last_scheduler_time == schedule_time:
-                    self.last_scheduler_task = list()
-                    self.scheduler_mode = False
-                    return None, None, None, self.scheduler_mode
-                self.log.debug(f"Listing tasks for time: {schedule_time}")
-                remain_task = [cmd for cmd in commands if cmd not in self.last_scheduler_task]
-                if len(remain_task) == 0:
-                    self.log.debug(f"All Job done for time: {schedule_time}, resetting")
-                    self.last_scheduler_time = schedule_time
-                    self.scheduler_mode = False
-                    self.interactive_mode = False
-                    return None, None, None, self.scheduler_mode
-                self.log.debug(f"Generating message for scheduler task: {remain_task[0]}")
-                scheduler_messages = remain_task[0]
-                scheduler_sender = 'system_scheduler'
-                scheduler_hour = schedule_time
-                self.last_scheduler_task.append(remain_task[0])
-                return scheduler_messages, scheduler_sender, scheduler_hour, self.scheduler_mode
-        self.scheduler_mode = False
-        return None, None, None, self.scheduler_mode
-    
+        due = OrderedDict()
+        for slot, command, name in self.schedule_engine.pop_due(now):
+            session = self.sessions.get(name)
+            if session is None or (slot, command) in session.scheduled:
+                continue
+            session.scheduled = {key for key in session.scheduled if key[0] > now - timedelta(days=1)}
+            session.scheduled.add((slot, command))
+            if self.schedule_store.status(slot, command, session.name) in schedule_store.FINAL_STATUSES:
+                continue
+            due.setdefault((slot, command), []).append(session)
+        if due:
+            self._submit_scheduled(due)
+
+    def heartbeat(self):
+        if time.time() - self.last_heartbeat_time >= self.scheduler_options.get("heartbeat_interval", 30):
+            self.last_heartbeat_time = time.time()
+            self.schedule_store.heartbeat()
+
+    def catch_up(self):
+        """Re-run slots missed while the bot was down, following scheduler_options.catch_up per command:
+        "all" sends every missed slot, "latest" only the most recent one, "skip" none. Only slots after the
+        previous process's last heartbeat, or ones it had already started on, count as missed, so a fresh
+        store or a newly added slot does not post anything retroactively."""
+        now = datetime.now()
+        policies = self.scheduler_options.get("catch_up", {})
+        horizon = now - timedelta(hours=self.scheduler_options.get("catch_up_hours", 12))
+        last_alive = self.schedule_store.last_alive()
+        self.last_heartbeat_time = time.time()
+        self.schedule_store.heartbeat(now)
+        self.schedule_store.prune(now - timedelta(days=self.scheduler_options.get("history_days", 30)))
+        for staged_path in glob.glob(os.path.join(self.scheduler_options.get("staging_dir", "staging"), "*")):
+            os.remove(staged_path)
+        missed = OrderedDict()
+        for name, trigger, commands in self.schedule_engine.triggers:
+            session = self.sessions[name]
+            for slot in trigger.between(horizon, now - self.schedule_engine.grace):
+                for command in commands:
+                    status = self.schedule_store.status(slot, command, session.name)
+                    if status in schedule_store.FINAL_STATUSES:
+                        continue
+                    if status is not None or (last_alive is not None and slot > last_alive):
+                        missed.setdefault((session, command), []).append(slot)
+        due = OrderedDict()
+        for (session, command), slots in missed.items():
+            policy = policies.get(command, policies.get("default", "latest"))
+            keep = {"all": slots, "latest": [max(slots)]}.get(policy, [])
+            for slot in slots:
+                if slot in keep:
+                    due.setdefault((slot, command), []).append(session)
+                else:
+                    self.schedule_store.mark(slot, command, session.name, "skipped")
+                    self.log.info(f"Skipping missed '{command}' for {slot:%Y-%m-%d %H:%M} in {session.name} ({policy})")
+        for (slot, command), sessions in due.items():
+            self.log.info(f"Catching up on '{command}' missed at {slot:%Y-%m-%d %H:%M} in {', '.join(s.name for s in sessions)}")
+        self._submit_scheduled(due, catch_up=True)
+
+    def _submit_scheduled(self, due, catch_up=False):
+        batches = OrderedDict()
+        for (slot, command), sessions in due.items():
+            post_at = None if catch_up else slot
+            if (command in self.keyword and self.keyword[command].get("mode") != "url_access"
+                    and self.report_pool.get("enabled", True) and sessions[0].allows(command)):
+                batches.setdefault((slot, self.keyword[command]["url"], tuple(sessions)), []).append(command)
+                continue
+            job = self.command_job(sessions[0], command)
+            if job is None:
+                self.log.warning(f"Unknown scheduled command: {command}")
+                continue
+            kind, build = job
+            self.log.info(f"Scheduling '{command}' for {slot:%H:%M} in {', '.join(s.name for s in sessions)}")
+            self.submit_job(command, kind, build, sessions, "system_scheduler", post_at=post_at, commands=[command], slot=slot)
+        for (slot, _, sessions), commands in batches.items():
+            self.log.info(f"Scheduling {' + '.join(commands)} for {slot:%H:%M} in one report tab for "
+                          f"{', '.join(s.name for s in sessions)}")
+            self.submit_job(" + ".join(commands), "images", lambda commands=commands: [self.render_report(c) for c in commands],
+                            list(sessions), "system_scheduler", post_at=None if catch_up else slot, commands=commands, slot=slot)
+
+    def warm_report_tabs(self):
+        interval = self.report_pool.get("warm_interval", 600)
+        if not self.keyword or not self.report_pool.get("enabled", True) or self.jobs.pending:
+            return
+        if time.time() - self.last_warm_time < interval:
+            return
+        self.last_warm_time = time.time()
+        # the pool may hand two jobs to one thread; the barrier holds each job until every worker has taken one
+        barrier = threading.Barrier(self.jobs.workers)
+        for _ in range(self.jobs.workers):
+            self.jobs.submit(Job("warm report tabs", "warmup", "system_warmup",
+                                 lambda: self._warm_worker(barrier), []))
+
+    def _warm_worker(self, barrier: threading.Barrier):
+        try:
+            barrier.wait(60)
+        except threading.BrokenBarrierError:
+            self.log.debug("Not every render worker picked up a warm-up job, warming this one anyway")
+        self.warm_reports()
+
     def health_check(self):
         try:
             current_url = self.driver.current_url
@@ -406,27 +1425,37 @@ class WhatsAppBot:
             self.wait_for_presence('//div[@contenteditable="true"][@data-tab="3"]', timeout=120)
         except TimeoutException:
             pass
-        self.open_group(self.config["groupname"])
+        self.current_chat = None
+        self._chat_rows = {}
+        self.open_chat(next(iter(self.sessions)))
         self.log.success("WebDriver restarted successfully")
 
+    def shutdown(self):
+        self.jobs.shutdown()
+        dbpool.close_all()
+        ssrs.close()
+        self.schedule_store.close()
+        for driver in self._render_drivers + [self.driver]:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
     def run(self):
         self.log.info("Starting WhatsApp Bot main loop")
+        self.catch_up()
         consecutive_errors = 0
         max_consecutive_errors = self.max_consecutive_errors
         
         while True:
-            self._load_config()
-            scheduler_messages, scheduler_sender, scheduler_hour, self.scheduler_mode = self.scheduler()
+            for step in (self._load_config, self.deliver_jobs, self.scheduler, self.warm_report_tabs, self.heartbeat):
+                try:
+                    step()
+                except Exception as e:
+                    self.log.error(f"{step.__name__} failed, continuing: {e}")
+                    self.log.debug(f"Traceback details:\n{traceback.format_exc()}")
             try:
-                last_sender, last_messages, last_hour = self.get_message()
-                if self.scheduler_mode:
-                    self.log.debug(f"Entering scheduler mode..")
-                    self.interactive_mode = True
-                    self.session_caller = scheduler_sender
-                    self.last_activity_time = time.time()
-                    last_sender = scheduler_sender
-                    last_messages = scheduler_messages
-                    last_hour = scheduler_hour
+                session, last_sender, last_messages, _ = self.get_message()
                 consecutive_errors = 0 
             except Exception as e:
                 consecutive_errors += 1
@@ -439,165 +1468,52 @@ class WhatsAppBot:
                 self.restart_driver()
                 time.sleep(5)
                 continue
-            if self.interactive_mode and self.last_activity_time and (time.time() - self.last_activity_time > self.session_timeout):
-                self.log.warning(f"Session timeout for user: {self.session_caller}")
-                self.send_message(self.messages["no_response"].format(user=self.session_caller))
-                self.last_activity_time = None
-                self.interactive_mode = False
-                self.session_caller = None
-                time.sleep(2)
-                continue
-            if last_messages == self.latest_messages and last_hour == self.latest_hour:
-                time.sleep(2)
+            for group in self.sessions.values():
+                for user in list(group.users.values()):
+                    if not self.jobs.has_pending(user.sender, group) and time.time() - user.last_activity_time > self.session_timeout:
+                        self.log.warning(f"Session timeout for user: {user.sender} ({group.name})")
+                        group.end(user.sender)
+                        self.reply(group, self.messages["no_response"].format(user=user.sender))
+            if last_messages is None:
+                time.sleep(min(self.poll_interval, self.schedule_engine.seconds_until_next()))
                 continue
             last_messages = last_messages.lower()
-            self.latest_messages = last_messages
-            self.latest_hour = last_hour
+            force_refresh = last_messages.endswith(" " + self.refresh_suffix)
+            if force_refresh:
+                last_messages = last_messages[:-len(self.refresh_suffix)].strip()
             if last_sender != 'Bapak/Ibu':
-                self.latest_sender = last_sender
+                session.latest_sender = last_sender
+            sender = session.latest_sender or last_sender
             try:
-                if self.interactive_mode:
-                    if last_sender != self.session_caller and (last_messages in list(self.keyword.keys()) 
-                                                            or last_messages in self.keyword_sql.keys() 
-                                                            or last_messages.split()[0] in self.keyword_sql.keys()
-                                                            or 'bot mio' in last_messages):
-                        self.log.debug(f"Message from {last_sender} while session with {self.session_caller} is active")
-                        self.send_message(self.messages["wait"].format(user=self.session_caller))
-                        time.sleep(2)
-                        continue
-                    self.last_activity_time = time.time()
-                    if last_messages in self.affirmative_keywords:
-                        self.log.debug("User responded affirmatively")
-                        self.send_message(self.messages["ask_help"])
-                        time.sleep(2)
-                        continue
-                    if last_messages == "help":
-                        self.log.debug("User requested help")
-                        self.send_message(self.help_text, is_multiline=True)
-                        time.sleep(2)
+                user = session.users.get(sender)
+                if user:
+                    user.last_activity_time = time.time()
+                    route = self.router.route(last_messages)
+                    if route and (route.handler.kind is None or session.allows(route.name)):
+                        route.handler.handle(self, session, sender, route, force_refresh)
                         continue
-                    if last_messages in self.negative_keywords:
-                        self.log.info(f"Session ended by user: {self.session_caller}")
-                        self.interactive_mode = False
-                        self.session_caller = None
-                        self.last_activity_time = None
-                        self.send_message(self.messages["session_end"])
-                        time.sleep(2)
-                        continue
-                    if last_messages in list(self.keyword.keys()):
-                        self.log.info(f"Processing request: {last_messages}")
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["processing"].format(command=last_messages))
-                        new_tab = self.open_new_tab(self.keyword[last_messages]["url"])
-                        self.switch_tab(new_tab)
-                        self.input_parameter(last_messages)
-                        time.sleep(5)
-                        detection = self.wait_for_visibility(self.keyword[last_messages]["detection"], 120)
-                        detection.click()
-                        if self.keyword[last_messages]["caption"] == "xpath":
-                            caption_text = self.wait_for_visibility("//*[contains(text(), 'captionbox')]")
-                            caption = caption_text.text.strip()
-                        else:
-                            caption = self.keyword[last_messages]["caption"] + self.getdate()
-                        caption_list = [line for line in caption.splitlines() if "captionbox" not in line.lower()]
-                        filename = self.take_screenshot(last_messages)
-                        self.close_current_tab()
-                        self.open_group(self.config["groupname"])
-                        self.send_image(filename, caption_list)
-                        os.remove(filename)
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                        self.last_activity_time = time.time()
-                        self.log.success(f"Successfully processed request: {last_messages}")
-                        time.sleep(2)
-                        continue
-                    if last_messages in self.keyword_sql.keys():
-                        self.log.info(f"Processing SQL request: {last_messages}")
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["processing"].format(command=last_messages))
-                        self.command_key = last_messages
-                        self.values = []
-                        self.result = self.execute_sql(self.command_key, self.values, timeout=60)
-                        self.send_message(self.result, is_multiline=True)
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                        self.log.success(f"Successfully processed request: {last_messages}")
-                        time.sleep(2)
-                        continue
-                    if last_messages.split()[0] in self.keyword_sql.keys():
-                        self.log.info(f"Processing SQL request: {last_messages}")
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["processing"].format(command=last_messages))
-                        parts = last_messages.split()
-                        self.command_key = parts[0]
-                        self.values = parts[1:]
-                        self.result = self.execute_sql(self.command_key, self.values, timeout=60)
-                        self.send_message(self.result, is_multiline=True)
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                        self.log.success(f"Successfully processed request: {last_messages}")
-                        time.sleep(2)
-                        continue
-                    if last_messages in self.keyword_py.keys() and self.keyword_py.get(last_messages, {}).get("output_type") == "image":
-                        self.log.info(f"Executing Python request: {last_messages}")
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["processing"].format(command=last_messages))
-                        image_path, caption = self.execute_python(last_messages)
-                        if not self.module_found:
-                            self.send_message(f"Maaf module untuk service '{last_messages}' tidak ditemukan/salah")
-                            continue
-                        self.send_image(image_path, caption)
-                        os.remove(image_path)
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                        self.log.success(f"Successfully processed request: {last_messages}")
-                        self.last_activity_time = time.time()
-                        time.sleep(2)
-                        continue
-                    if last_messages in self.keyword_py.keys() and self.keyword_py.get(last_messages, {}).get("output_type") == "html":
-                        self.log.info(f"Executing Python request: {last_messages}")
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["processing"].format(command=last_messages))
-                        html_path, caption = self.execute_python(last_messages)
-                        if not self.module_found:
-                            self.send_message(f"Maaf module untuk service '{last_messages}' tidak ditemukan/salah")
-                            continue
-                        self.driver.set_window_size(self.keyword_py[last_messages]["width"], self.keyword_py[last_messages]["height"])
-                        self.log.debug(f"Opening HTML file in new tab: {html_path}")
-                        new_tab = self.open_new_tab(f"file:///{os.path.abspath(html_path).replace(os.sep, '/')}")
-                        self.switch_tab(new_tab)
-                        time.sleep(5)
-                        picture_name = self.driver.current_window_handle + '.png'
-                        element = self.wait_for_visibility("/html/body")
-                        element.screenshot(picture_name)
-                        if not self.config.get("headless", False):
-                            self.driver.maximize_window()
-                        else:
-                            self.driver.set_window_size(1920, 1080)
-                        self.close_current_tab()
-                        self.open_group(self.config["groupname"])
-                        self.send_image(picture_name, caption)
-                        os.remove(picture_name)
-                        os.remove(html_path)
-                        [os.remove(f) for f in glob.glob("templates/asset/*") if os.path.isfile(f)]
-                        if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                        self.log.success(f"Successfully processed request: {last_messages}")
-                        self.module_found = False
-                        self.last_activity_time = time.time()
-                        time.sleep(2)
-                        continue
-                    self.log.warning(f"Unknown command received: {last_messages}")
-                    self.send_message(self.messages["unknown"])
-                    time.sleep(2)
+                    self.log.warning(f"Unknown command received from {sender}: {last_messages}")
+                    suggestions = [name for name in self.router.suggest(last_messages) if session.allows(name)]
+                    if suggestions and self.messages.get("suggestion"):
+                        self.reply(session, self.messages["suggestion"].format(commands=", ".join(suggestions)))
+                    self.reply(session, self.messages["unknown"])
                     continue
 
-                if 'bot mio' in last_messages and self.interactive_mode == False:
-                    self.log.info(f"Bot activated by user: {self.latest_sender}")
-                    self.interactive_mode = True
-                    self.session_caller = self.latest_sender
-                    self.send_message(self.messages["activation"].format(user=self.session_caller))
-                    self.last_activity_time = time.time()
+                if 'bot mio' in last_messages:
+                    if len(session.users) >= session.max_sessions:
+                        self.log.debug(f"{sender} waiting, {len(session.users)} sessions active in {session.name}")
+                        self.reply(session, self.messages["wait"].format(user=", ".join(session.users)))
+                        continue
+                    self.log.info(f"Bot activated by user: {sender} ({session.name}), {len(session.users) + 1} active")
+                    session.start(sender)
+                    self.reply(session, self.messages["activation"].format(user=sender))
                     continue
-                time.sleep(2)
             except Exception as e:
                 error_details = traceback.format_exc()
                 self.log.error(f"Failed to process command '{last_messages}' from {last_sender}: {e}")
                 self.log.debug(f"Traceback details:\n{error_details}")
-                self.send_message(f"Gagal memproses perintah '{last_messages}'. Silakan coba lagi nanti.")
-                if self.session_caller != "system_scheduler": self.send_message(self.messages["confirmation"])
-                self.last_activity_time = time.time()
-                time.sleep(2)
+                self.reply(session, f"Gagal memproses perintah '{last_messages}'. Silakan coba lagi nanti.")
+                self.reply(session, self.messages["confirmation"].format(user=sender))
                 continue
 
 def signal_handler(signum, frame):
@@ -624,7 +1540,7 @@ def main():
             log.warning("KeyboardInterrupt detected. Closing Chrome and exiting safely...")
             try:
                 if 'bot' in locals():
-                    bot.driver.quit()
+                    bot.shutdown()
             except Exception:
                 pass
             log.info("Application terminated gracefully by user")
@@ -636,7 +1552,7 @@ def main():
             
             try:
                 if 'bot' in locals():
-                    bot.driver.quit()
+                    bot.shutdown()
             except Exception:
                 pass
             
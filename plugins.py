@@ -0,0 +1,69 @@
+import os
+import json
+import threading
+import importlib.util
+
+_modules = {}
+_instances = {}
+_locks = {}
+_lock = threading.Lock()
+
+def _path_lock(path: str) -> threading.Lock:
+    with _lock:
+        return _locks.setdefault(path, threading.Lock())
+
+def load_module(python_path: str):
+    """Import a python_service module once; re-import it only when the file's mtime changes. Only the
+    service file itself is reloaded: shared modules it imports (analytics, positions, regions) stay as
+    first imported, so edits to them still need a restart."""
+    path = os.path.abspath(python_path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    mtime = os.path.getmtime(path)
+    with _path_lock(path):
+        cached = _modules.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = (mtime, module)
+        return module
+
+def get_instance(python_path: str, class_name: str, parameters: dict, keep: bool = False):
+    """Return (instance, lock). With keep=True the instance is reused until the module reloads or
+    its parameters change; callers hold the lock while using it."""
+    module = load_module(python_path)
+    cls = getattr(module, class_name)
+    if not keep:
+        return cls(**parameters), threading.Lock()
+    key = (os.path.abspath(python_path), class_name, json.dumps(parameters, sort_keys=True))
+    with _lock:
+        cached = _instances.get(key)
+        if cached and cached[0] is module:
+            return cached[1], cached[2]
+    instance = cls(**parameters)
+    with _lock:
+        cached = _instances.get(key)
+        if cached and cached[0] is module:
+            return cached[1], cached[2]
+        for stale in [k for k in _instances if k[:2] == key[:2]]:
+            del _instances[stale]
+        _instances[key] = (module, instance, threading.Lock())
+        return instance, _instances[key][2]
+
+def preload(python_paths: list, log=None) -> threading.Thread:
+    """Import the given service modules (and their heavy dependencies) on a background thread."""
+    def run():
+        for python_path in python_paths:
+            try:
+                load_module(python_path)
+                if log:
+                    log.debug(f"Preloaded service module: {python_path}")
+            except Exception as e:
+                if log:
+                    log.warning(f"Unable to preload {python_path}: {e}")
+    thread = threading.Thread(target=run, name="plugin-preload", daemon=True)
+    thread.start()
+    return thread
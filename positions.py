@@ -0,0 +1,172 @@
+import os
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+import dbpool
+import regions
+
+POSITION_SQL = """
+select mobileid,reporttime,mobiletypeid,pos_lon,pos_lat
+,pos_name,pos_speed,mobileactivityid,mobilestatusid,plm_inc
+from dbo.opr_pos
+where reporttime > ? and reporttime <= ?
+and pos_lon>0 and pos_lat>0 and pos_speed between 0 and 60
+"""
+
+CATEGORY_COLUMNS = ["mobileid", "pos_name", "mobilestatusid"]
+FLOAT_COLUMNS = ["pos_lon", "pos_lat", "pos_speed", "plm_inc"]
+INTEGER_COLUMNS = ["mobiletypeid", "mobileactivityid"]
+
+_stores = {}
+_lock = threading.Lock()
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    if "reporttime" in df.columns:
+        df["reporttime"] = pd.to_datetime(df["reporttime"])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and df[col].dtype.name != "category":
+            df[col] = df[col].astype("category")
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+def window_bounds(window_hours: float, end_time: str = None):
+    end = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S") if end_time else datetime.now()
+    return end - timedelta(hours=window_hours), end
+
+class PositionSnapshot:
+    """opr_pos rows partitioned as <root>/date=YYYY-MM-DD/hour=H/part.parquet. Each write merges its rows
+    into the hour partitions they fall in, so late rows land too and every hour stays a single file."""
+    KEY_COLUMNS = ["mobileid", "reporttime"]
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _merge(self, directory: str, rows: pd.DataFrame):
+        parts = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")]
+        if parts:
+            held = pd.concat([pd.read_parquet(part, engine="pyarrow") for part in parts], ignore_index=True)
+            rows = pd.concat([held, rows], ignore_index=True).astype({"mobileid": str})
+            rows = rows.drop_duplicates(self.KEY_COLUMNS, keep="first").sort_values("reporttime")
+        target = os.path.join(directory, "part.parquet")
+        tmp_path = os.path.join(directory, ".part.parquet.tmp")
+        rows.to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, target)
+        for part in parts:
+            if part != target:
+                os.remove(part)
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        df = df.drop(columns=[c for c in ("region_mask", "pos_excluded") if c in df.columns])
+        for (date, hour), rows in df.groupby([df["reporttime"].dt.strftime("%Y-%m-%d"), df["reporttime"].dt.hour]):
+            directory = os.path.join(self.root, f"date={date}", f"hour={hour}")
+            os.makedirs(directory, exist_ok=True)
+            self._merge(directory, rows)
+
+    def read(self, start: datetime, end: datetime, bbox: tuple = None, columns: list = None) -> pd.DataFrame:
+        filters = [
+            ("date", ">=", f"{start:%Y-%m-%d}"),
+            ("date", "<=", f"{end:%Y-%m-%d}"),
+            ("reporttime", ">", pd.Timestamp(start)),
+            ("reporttime", "<=", pd.Timestamp(end)),
+        ]
+        if bbox:
+            max_lat, min_lat, max_lon, min_lon = bbox
+            filters += [
+                ("pos_lat", ">=", min_lat), ("pos_lat", "<=", max_lat),
+                ("pos_lon", ">=", min_lon), ("pos_lon", "<=", max_lon),
+            ]
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Position snapshot not found: {self.root}")
+        df = pd.read_parquet(self.root, engine="pyarrow", columns=columns, filters=filters)
+        df = df.drop(columns=[c for c in ("date", "hour") if c in df.columns])
+        return regions.label(compact(df.reset_index(drop=True)))
+
+class PositionStore:
+    """Rolling window of positions. Incremental refreshes re-read `overlap` before the newest row held,
+    so rows that reach the database late are still picked up; duplicates are dropped on KEY_COLUMNS."""
+    KEY_COLUMNS = ["mobileid", "reporttime"]
+
+    def __init__(self, server: str, database: str, retention_hours: float = 6, snapshot: PositionSnapshot = None,
+                 overlap_seconds: float = 300):
+        self.server = server
+        self.database = database
+        self.retention = timedelta(hours=retention_hours)
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.snapshot = snapshot
+        self.df = None
+        self.loaded_from = None
+        self.fetched_until = None
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, after: datetime, until: datetime) -> pd.DataFrame:
+        with dbpool.connection(self.server, self.database) as conn:
+            df = regions.label(compact(pd.read_sql(POSITION_SQL, conn, params=[after, until])))
+        if self.snapshot is not None:
+            self.snapshot.write(df)
+        return df
+
+    def _unseen(self, rows: pd.DataFrame, after: datetime) -> pd.DataFrame:
+        held = self.df.loc[self.df["reporttime"] > after, self.KEY_COLUMNS]
+        if held.empty or rows.empty:
+            return rows
+        held = pd.MultiIndex.from_frame(held.astype({"mobileid": str}))
+        fetched = pd.MultiIndex.from_frame(rows[self.KEY_COLUMNS].astype({"mobileid": str}))
+        return rows[~fetched.isin(held)]
+
+    def _advance(self, rows: pd.DataFrame):
+        if len(rows):
+            newest = rows["reporttime"].max().to_pydatetime()
+            self.watermark = max(self.watermark, newest) if self.watermark else newest
+
+    def refresh(self, start: datetime, end: datetime):
+        with self._lock:
+            if self.df is None or start < self.loaded_from:
+                self.df = self._fetch(start, end)
+                self.loaded_from = start
+                self.fetched_until = end
+                self.watermark = None
+                self._advance(self.df)
+            elif end > self.fetched_until:
+                after = max(min(self.watermark or self.loaded_from, self.fetched_until) - self.overlap, self.loaded_from)
+                new_rows = self._unseen(self._fetch(after, end), after)
+                if len(new_rows):
+                    self.df = compact(pd.concat([self.df, new_rows], ignore_index=True))
+                self.fetched_until = end
+                self._advance(new_rows)
+            keep_from = min(start, self.fetched_until - self.retention)
+            if keep_from > self.loaded_from:
+                self.df = self.df[self.df["reporttime"] > keep_from].reset_index(drop=True)
+                self.loaded_from = keep_from
+
+    def window(self, start: datetime, end: datetime) -> pd.DataFrame:
+        self.refresh(start, end)
+        with self._lock:
+            df = self.df
+        return df[(df["reporttime"] > start) & (df["reporttime"] <= end)].reset_index(drop=True)
+
+def get_store(server: str, database: str, retention_hours: float = 6, snapshot_dir: str = None) -> PositionStore:
+    key = (server.lower(), database.lower())
+    with _lock:
+        if key not in _stores:
+            _stores[key] = PositionStore(server, database, retention_hours)
+        store = _stores[key]
+        if snapshot_dir and store.snapshot is None:
+            store.snapshot = PositionSnapshot(snapshot_dir)
+        return store
+
+def relabel():
+    """Recompute the region labels of every held window after the region set changed."""
+    with _lock:
+        stores = list(_stores.values())
+    for store in stores:
+        with store._lock:
+            if store.df is not None:
+                store.df = regions.label(store.df.copy())
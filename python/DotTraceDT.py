@@ -2,32 +2,47 @@ import os
 import folium
 import rasterio
 import numpy as np
-import pandas as pd
 from PIL import Image
 import geopandas as gpd
 from datetime import datetime
-import matplotlib.pyplot as plt
-import io, base64, pyodbc, uuid
-from rasterio.plot import reshape_as_image
-from rasterio.warp import transform_bounds
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.patches import Ellipse, FancyBboxPatch
+import io, base64, uuid, json, hashlib, pathlib
+import analytics
+import regions
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import from_bounds
 from folium.raster_layers import ImageOverlay
 
 class DotTraceDT:
-    REGIONS = {
-        "PA1": (0.731, 0.691, 117.504, 117.463),
-        "PA2": (0.722, 0.676, 117.463, 117.434),
-        "PA2-SELATAN": (0.702, 0.682, 117.475, 117.435),
-        "PA3-UTARA": (0.674, 0.629, 117.470, 117.422),
-        "PA3-SELATAN": (0.608, 0.570, 117.465, 117.425),
-    }
-
-    def __init__(self, region: str, tif_path: str, sample_frac: float = 0.2):
+    REGIONS = analytics.REGIONS
+    SPEED_BINS = [1, 18, 20, 25]
+    SPEED_COLORS = ["blue", "red", "yellow", "green", "black"]
+    SPEED_RGBA = [(0, 0, 255, 255), (255, 0, 0, 255), (255, 255, 0, 255), (0, 128, 0, 255), (0, 0, 0, 255)]
+
+    def __init__(self, region: str, tif_path: str, server: str, database: str,
+                 window_hours: float = 1, end_time: str = None, snapshot_dir: str = None, offline: bool = False,
+                 sample_frac: float = 0.2, trace_mode: str = "raster", raster_width: int = 1600, raster_dot: int = 1,
+                 ortho_width: int = 2048, ortho_format: str = "webp", ortho_cache_dir: str = "templates/cache",
+                 width: int = 1366, height: int = 900):
         if region not in self.REGIONS:
             raise ValueError(f"Region '{region}' not found in available regions: {list(self.REGIONS.keys())}")
         self.region = region
+        self.source = analytics.PositionSource(server, database, window_hours, end_time, snapshot_dir, offline)
         self.tif_path = tif_path
         self.sample_frac = sample_frac
+        self.trace_mode = trace_mode
+        self.raster_width = raster_width
+        self.raster_dot = raster_dot
+        self.ortho_width = ortho_width
+        self.ortho_format = ortho_format
+        self.ortho_cache_dir = ortho_cache_dir
+        self.width = width
+        self.height = height
         self.df = None
+        self.window = None
         self.html_file = None
         self.caption = None
         self.analytic_result = None
@@ -44,46 +59,67 @@ class DotTraceDT:
         return (max_lat + min_lat) / 2, (max_lon + min_lon) / 2
 
     def query_database(self):
-        conn_str = "Driver={SQL Server};Server=LAPTOP-5HOEAIO4\\SQLEXPRESS;Database=db_ewacs_fgdp;Trusted_Connection=yes;"
-        sql = """
-        select mobileid,reporttime,mobiletypeid,pos_lon,pos_lat
-        ,pos_name,pos_speed,mobileactivityid,mobilestatusid,plm_inc
-        from db_ewacs_fgdp.dbo.opr_pos
-        where reporttime between '2025-06-06 21:00:00' and '2025-06-06 22:00:00'
-        and pos_lon>0 and pos_lat>0 and pos_speed between 0 and 60
-        """
-        with pyodbc.connect(conn_str) as conn:
-            df = pd.read_sql(sql, conn)
-        if "reporttime" in df.columns:
-            df["reporttime"] = df["reporttime"].dt.strftime("%Y-%m-%d %H:%M:%S")
-        self.df = df
+        self.window = analytics.production_window(self.source, self.region, full=True)
+        self.df = self.window.df
+
+    def _ortho_overlay(self):
+        tif_path = os.path.abspath(self.tif_path)
+        key = hashlib.sha1(f"{tif_path}|{os.path.getmtime(tif_path)}|{self.region}|{self.REGIONS[self.region]}|"
+                           f"{self.ortho_width}".encode()).hexdigest()[:16]
+        image_path = os.path.join(self.ortho_cache_dir, f"ortho_{self.region}_{key}.{self.ortho_format}")
+        meta_path = image_path + ".json"
+        if os.path.exists(image_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    return image_path, json.load(f)["bounds"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        max_lat, min_lat, max_lon, min_lon = self.REGIONS[self.region]
+        with rasterio.open(tif_path) as src, WarpedVRT(src, crs="EPSG:4326", resampling=Resampling.bilinear) as vrt:
+            left, bottom, right, top = vrt.bounds
+            west, south, east, north = max(min_lon, left), max(min_lat, bottom), min(max_lon, right), min(max_lat, top)
+            if west >= east or south >= north:
+                return None, None
+            window = from_bounds(west, south, east, north, vrt.transform)
+            width = max(1, min(self.ortho_width, int(window.width)))
+            height = max(1, int(round(width * window.height / window.width)))
+            bands = [vrt.read(i, window=window, out_shape=(height, width), resampling=Resampling.average)
+                     for i in ([1] * 3 if vrt.count == 1 else [1, 2, 3])]
+            alpha = vrt.read_masks(1, window=window, out_shape=(height, width))
+        image = Image.fromarray(np.dstack(bands + [alpha]).astype(np.uint8))
+
+        os.makedirs(self.ortho_cache_dir, exist_ok=True)
+        bounds = [[south, west], [north, east]]
+        suffix = f".{uuid.uuid4().hex[:8]}.tmp"
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({"tif_path": tif_path, "region": self.region, "bounds": bounds}, f)
+        os.replace(meta_path + suffix, meta_path)
+        image.save(image_path + suffix, format=self.ortho_format.upper(), quality=85)
+        os.replace(image_path + suffix, image_path)
+        return image_path, bounds
 
     def _add_tif(self, m):
-        with rasterio.open(self.tif_path) as src:
-            img = src.read()
-            img_rgb = np.stack([img[0]]*3, axis=0) if img.shape[0] == 1 else img[:3]
-            image = reshape_as_image(img_rgb)
-            pil_img = Image.fromarray(image)
-            buffer = io.BytesIO(); pil_img.save(buffer, format="PNG")
-            data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
-            if src.crs and src.crs.to_epsg() != 4326:
-                minx, miny, maxx, maxy = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
-            else:
-                minx, miny, maxx, maxy = src.bounds
-            bounds = [[miny, minx], [maxy, maxx]]
-            ImageOverlay(data_url, bounds, opacity=1, zindex=1).add_to(m)
+        image_path, bounds = self._ortho_overlay()
+        if image_path:
+            ImageOverlay(pathlib.Path(image_path).resolve().as_uri(), bounds, opacity=1, zindex=1).add_to(m)
 
-    def _add_trace(self, m):
+    def _trace_points(self):
+        return self.df[(self.df["mobiletypeid"] == 2) & analytics.in_region(self.df, self.region)]
+
+    def _add_outline(self, m):
         max_lat, min_lat, max_lon, min_lon = self.REGIONS[self.region]
-        df_r = self.df[(self.df["mobiletypeid"] == 2) &
-                       self.df["pos_lon"].between(min_lon, max_lon) &
-                       self.df["pos_lat"].between(min_lat, max_lat)]
+        outline = regions.POLYGONS.get(self.region,
+                                       [(max_lat, min_lon), (min_lat, min_lon), (min_lat, max_lon), (max_lat, max_lon)])
+        folium.Polygon(outline, color="gray").add_to(m)
+
+    def _add_trace(self, m):
+        df_r = self._trace_points()
         sampled = df_r.sample(max(1000, int(len(df_r) * self.sample_frac)), random_state=42)
-        gdf = gpd.GeoDataFrame(sampled,
+        gdf = gpd.GeoDataFrame(sampled[["pos_speed"]].astype("float64"),
                                geometry=gpd.points_from_xy(sampled.pos_lon, sampled.pos_lat),
                                crs="EPSG:4326")
-        folium.Polygon([(max_lat, min_lon), (min_lat, min_lon), (min_lat, max_lon), (max_lat, max_lon)],
-                       color="gray").add_to(m)
+        self._add_outline(m)
         folium.GeoJson(
             gdf,
             marker=folium.CircleMarker(),
@@ -95,8 +131,41 @@ class DotTraceDT:
             }
         ).add_to(m)
 
+    def _trace_raster(self, df_r) -> np.ndarray:
+        """Palette index per pixel: 0 is empty, 1..5 map to SPEED_RGBA from fastest to slowest."""
+        max_lat, min_lat, max_lon, min_lon = self.REGIONS[self.region]
+        width = self.raster_width
+        height = max(1, int(round(width * (max_lat - min_lat) / (max_lon - min_lon))))
+        lon = df_r["pos_lon"].to_numpy(dtype="float64")
+        lat = df_r["pos_lat"].to_numpy(dtype="float64")
+        x = np.clip(((lon - min_lon) / (max_lon - min_lon) * (width - 1)).astype(np.int64), 0, width - 1)
+        y = np.clip(((max_lat - lat) / (max_lat - min_lat) * (height - 1)).astype(np.int64), 0, height - 1)
+        # slower speed classes get a higher priority so they stay visible where points overlap
+        priority = (len(self.SPEED_COLORS) - np.digitize(df_r["pos_speed"].to_numpy(), self.SPEED_BINS)).astype(np.uint8)
+        grid = np.zeros(height * width, dtype=np.uint8)
+        np.maximum.at(grid, y * width + x, priority)
+        grid = grid.reshape(height, width)
+        r = self.raster_dot
+        padded = np.pad(grid, r)
+        dilated = grid.copy()
+        for dy in range(2 * r + 1):
+            for dx in range(2 * r + 1):
+                np.maximum(dilated, padded[dy:dy + height, dx:dx + width], out=dilated)
+        return dilated
+
+    def _trace_palette(self):
+        return [(0, 0, 0, 0)] + self.SPEED_RGBA[::-1]
+
+    def _add_trace_raster(self, m):
+        image = Image.fromarray(self._trace_raster(self._trace_points()), mode="P")
+        image.putpalette([channel for rgba in self._trace_palette() for channel in rgba], rawmode="RGBA")
+        buffer = io.BytesIO(); image.save(buffer, format="PNG")
+        data_url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+        self._add_outline(m)
+        ImageOverlay(data_url, self.bounds, opacity=1, zindex=2).add_to(m)
+
     def _speed_color(self, s):
-        return "blue" if s < 1 else "red" if s < 18 else "yellow" if s < 20 else "green" if s < 25 else "black"
+        return self.SPEED_COLORS[int(np.digitize(s, self.SPEED_BINS))]
 
     def _image_to_base64(self, image_path: str) -> str:
         with open(image_path, "rb") as image_file:
@@ -104,23 +173,9 @@ class DotTraceDT:
         return encoded_string
     
     def analyze_dottrace(self, df):
-        df = self.df.copy()
-        df["reporttime"] = pd.to_datetime(df["reporttime"])
+        df = self.df
+        df_speed = self.window.df_speed
         duration_hours = (df["reporttime"].max() - df["reporttime"].min()).total_seconds() / 3600
-        max_lat, min_lat, max_lon, min_lon = self.REGIONS[self.region]
-
-        mask = (
-            ~df["pos_name"].str.startswith(("IN", "FRONT", "DISP", "GPS"), na=False) &
-            ~df["pos_name"].str.contains("CS", na=False)
-        )
-
-        df_speed = df[
-            df["mobileactivityid"].isin([1, 5]) &
-            (df["mobilestatusid"] == "PRD") &
-            df["pos_lon"].between(min_lon, max_lon) &
-            df["pos_lat"].between(min_lat, max_lat) &
-            mask
-        ]
 
         avg_speed = round(float(df_speed["pos_speed"].mean()), 1)
         loaded_speed = round(float(df[df["mobileactivityid"] == 5]["pos_speed"].mean()), 1)
@@ -130,7 +185,7 @@ class DotTraceDT:
 
         segmen_slow = (
             df_speed[(df_speed["pos_speed"] < 18) & (df_speed["pos_speed"] > 1)]
-            .groupby("pos_name")
+            .groupby("pos_name", observed=True)
             .agg(
                 avg_speed=("pos_speed", "mean"),
                 avg_pln_inc=("plm_inc", "mean"),
@@ -161,40 +216,10 @@ class DotTraceDT:
 
         self.analytic_result = result
 
-        df_speed = df_speed[df_speed["pos_speed"] > 1]
-        all_speeds = df_speed["pos_speed"].dropna().to_numpy()
-        bottom3_units = []
-        for u in df_speed.groupby("mobileid")["pos_speed"].mean().sort_values().index:
-            speeds = df_speed.loc[df_speed["mobileid"] == u, "pos_speed"].dropna().to_numpy()
-            q1, q2, q3 = np.percentile(speeds, [25, 50, 75])
-            if q3 - q1 >= 5 and q2 > 1:
-                bottom3_units.append(u)
-            if len(bottom3_units) == 3:
-                break
-        data = [all_speeds] + [df_speed.loc[df_speed["mobileid"] == u, "pos_speed"].dropna().to_numpy()
-                            for u in bottom3_units]
-        labels = ["ALL UNIT"] + [f"{u}" for u in bottom3_units]
-        plt.figure(figsize=(8,6))
-        box = plt.boxplot(data, labels=labels, patch_artist=True, showfliers=False)
-        colors = ["orange"] + ["lightblue"] * (len(data)-1)
-        for patch, color in zip(box["boxes"], colors):
-            patch.set_facecolor(color)
-        for i, d in enumerate(data, start=1):
-            q1, q2, q3 = np.percentile(d, [25, 50, 75])
-            plt.text(i, q1, f"{q1:.1f}", ha="center", va="bottom", fontsize=12)
-            plt.text(i, q2, f"{q2:.1f}", ha="center", va="bottom", fontsize=12)
-            plt.text(i, q3, f"{q3:.1f}", ha="center", va="bottom", fontsize=12)
-        plt.ylabel("Speed (kph)", fontsize=18, fontweight="bold")
-        plt.xticks(fontsize=20, fontweight="bold")
-        plt.yticks(fontsize=18, fontweight="bold")
-        plt.title("Boxplot of pos_speed (All Units vs Bottom 3 Units)")
-        plt.grid(axis="y", linestyle="--", alpha=0.7)
         os.makedirs("templates/asset", exist_ok=True)
         id = uuid.uuid4().hex[:8]
-        self.underspeed_chart = rf"templates\asset\underspeed_chart_{id}.png"
-        plt.savefig(self.underspeed_chart, bbox_inches="tight", dpi=150)
+        analytics.plot_underspeed(df_speed, rf"templates\asset\underspeed_chart_{id}.png")
         self.underspeed_chart = rf"asset\underspeed_chart_{id}.png"
-        plt.close()
 
     def generate(self) -> tuple[str, str]:
         self.query_database()
@@ -216,7 +241,10 @@ class DotTraceDT:
 
         m.get_root().html.add_child(folium.Element(content_panel))
         self._add_tif(m)
-        self._add_trace(m)
+        if self.trace_mode == "points":
+            self._add_trace(m)
+        else:
+            self._add_trace_raster(m)
 
         result = self.analytic_result
         for i in range(1, 6):
@@ -233,3 +261,104 @@ class DotTraceDT:
         m.save(self.html_file)
         return self.html_file, self.caption
 
+
+    def _draw_map(self, fig):
+        max_lat, min_lat, max_lon, min_lon = self.REGIONS[self.region]
+        ax = fig.add_axes([0, 0, 0.8, 1])
+        image_path, bounds = self._ortho_overlay()
+        if image_path:
+            (south, west), (north, east) = bounds
+            with Image.open(image_path) as ortho:
+                ax.imshow(np.asarray(ortho.convert("RGBA")), extent=[west, east, south, north], zorder=1)
+        palette = np.array(self._trace_palette(), dtype=np.uint8)
+        ax.imshow(palette[self._trace_raster(self._trace_points())], extent=[min_lon, max_lon, min_lat, max_lat],
+                  interpolation="nearest", zorder=2)
+        outline = regions.POLYGONS.get(self.region,
+                                       [(max_lat, min_lon), (min_lat, min_lon), (min_lat, max_lon), (max_lat, max_lon)])
+        lats, lons = zip(*(list(outline) + [outline[0]]))
+        ax.plot(lons, lats, color="gray", linewidth=3, zorder=3)
+
+        lat_scale = np.cos(np.radians((max_lat + min_lat) / 2))
+        result = self.analytic_result
+        for i in range(1, 6):
+            if f"pos_lat{i}" not in result:
+                break
+            ax.add_patch(Ellipse((result[f"pos_lon{i}"], result[f"pos_lat{i}"]), width=2 * 75 / (111320 * lat_scale),
+                                 height=2 * 75 / 110574, edgecolor="orange", facecolor="none", linewidth=3, zorder=4))
+        lon_span, lat_span = max_lon - min_lon, max_lat - min_lat
+        box_ratio = 0.8 * self.width / self.height
+        lon_span, lat_span = max(lon_span, lat_span * box_ratio / lat_scale), max(lat_span, lon_span * lat_scale / box_ratio)
+        ax.set_xlim((max_lon + min_lon - lon_span) / 2, (max_lon + min_lon + lon_span) / 2)
+        ax.set_ylim((max_lat + min_lat - lat_span) / 2, (max_lat + min_lat + lat_span) / 2)
+        ax.axis("off")
+
+        handles = [Line2D([], [], marker="o", linestyle="", color=color, label=label) for color, label in zip(
+            self.SPEED_COLORS, ["0 kph (zero speed)", "< 18 kph", "18–20 kph", "20–25 kph", "≥ 30 kph"])]
+        ax.legend(handles=handles, title="Speed Legend", loc="upper left", bbox_to_anchor=(0.03, 0.93),
+                  framealpha=0.8, title_fontproperties={"weight": "bold"})
+        header = fig.add_axes([0.03, 0.94, 0.06, 0.05])
+        header.axis("off")
+        for i, logo in enumerate(["asset/logo-kpc.png", "asset/logo-pama.png"]):
+            with Image.open(logo) as img:
+                header.imshow(np.asarray(img.convert("RGBA")), extent=[i, i + 0.9, 0, 1])
+        header.set_xlim(0, 2)
+        fig.text(0.095, 0.965, f"PAMA - KPCS - BOT MIO SPEED {self.region}", fontsize=14, fontweight="bold",
+                 color="#333", va="center", bbox={"facecolor": "white", "alpha": 0.8, "edgecolor": "none"})
+
+    def _draw_panel(self, fig):
+        result = self.analytic_result
+        ax = fig.add_axes([0.8, 0, 0.2, 1])
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.axis("off")
+        ax.add_patch(FancyBboxPatch((0.02, 0.005), 0.96, 0.99, boxstyle="round,pad=0,rounding_size=0.02",
+                                    facecolor="white", edgecolor="#bbb", alpha=0.9, zorder=0))
+        ax.text(0.5, 0.975, f"Created at : {datetime.now():%d-%m-%Y %H:%M:%S}", ha="center", fontsize=9, color="#344966")
+        ax.text(0.5, 0.945, "ROAD PERFORMANCE", ha="center", fontsize=12, fontweight="bold", color="#344966")
+        ax.text(0.5, 0.925, f"({result['dottrace_duration_hours']} jam terakhir)", ha="center", fontsize=9, color="#444")
+
+        card_color = "#ef4444" if result["average_speed"] < 23 else "#22c55e"
+        ax.add_patch(FancyBboxPatch((0.06, 0.78), 0.42, 0.12, boxstyle="round,pad=0,rounding_size=0.03",
+                                    facecolor=card_color, edgecolor="none"))
+        ax.text(0.27, 0.875, "AVERAGE ROAD SPEED", ha="center", fontsize=6, fontweight="bold", color="white")
+        ax.text(0.27, 0.825, f"{result['average_speed']}", ha="center", va="center", fontsize=26, fontweight="bold", color="white")
+        ax.text(0.27, 0.79, "kph", ha="center", fontsize=9, color="white")
+        for y, label, value, accent in [(0.845, "LOADED SPEED", result["loaded_speed"], "#06b6d4"),
+                                        (0.785, "EMPTY SPEED", result["empty_speed"], "#7c3aed")]:
+            ax.add_patch(FancyBboxPatch((0.52, y - 0.005), 0.42, 0.055, boxstyle="round,pad=0,rounding_size=0.02",
+                                        facecolor="white", edgecolor=accent, linewidth=1.5))
+            ax.text(0.56, y + 0.032, label, fontsize=7, fontweight="bold", color="#374151")
+            ax.text(0.56, y + 0.005, f"{value} kph", fontsize=12, fontweight="bold", color="#111827")
+        ax.text(0.27, 0.74, f"Jumlah DT\n{result['total_dt']} Unit", ha="center", va="center", fontsize=9, fontweight="bold")
+        ax.text(0.73, 0.74, f"Speed < 18 kph\n{result['percentage_slow']}%", ha="center", va="center", fontsize=9, fontweight="bold")
+
+        ax.text(0.5, 0.69, "Top 5 Lokasi Perlambatan:", ha="center", fontsize=10, fontweight="bold", color="#344966")
+        rows = [[result[f"loc{i}"], result[f"count{i}"], result[f"grade{i}"]] for i in range(1, 6) if f"loc{i}" in result]
+        if rows:
+            table = ax.table(cellText=rows, colLabels=["Lokasi", "Speed", "Grade"], cellLoc="center",
+                             bbox=[0.06, 0.68 - 0.035 * (len(rows) + 1), 0.88, 0.035 * (len(rows) + 1)])
+            table.set_zorder(2)
+            table.auto_set_font_size(False)
+            table.set_fontsize(8)
+            for col in range(3):
+                table[0, col].set_facecolor("#009879")
+                table[0, col].get_text().set_color("white")
+
+        ax.text(0.5, 0.43, "Bottom 3 Speed Operator:", ha="center", fontsize=10, fontweight="bold", color="#344966")
+        chart = fig.add_axes([0.81, 0.02, 0.18, 0.39])
+        chart.set_anchor("N")
+        chart.axis("off")
+        with Image.open(rf"templates\{self.underspeed_chart}") as img:
+            chart.imshow(np.asarray(img.convert("RGBA")))
+
+    def generate_image(self) -> tuple[str, str]:
+        self.query_database()
+        self.analyze_dottrace(self.df)
+        fig = Figure(figsize=(self.width / 100, self.height / 100), dpi=100)
+        self._draw_map(fig)
+        self._draw_panel(fig)
+        image_path = f"dottrace_dt_{uuid.uuid4().hex[:8]}.png"
+        fig.savefig(image_path, dpi=100)
+        os.remove(rf"templates\{self.underspeed_chart}")
+        self.caption = f"Dot Trace DT {self.region} - {datetime.now():%Y-%m-%d %H:%M}"
+        return image_path, self.caption
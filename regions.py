@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+REGIONS = {
+    "PA1": (0.731, 0.691, 117.504, 117.463),
+    "PA2": (0.722, 0.676, 117.463, 117.434),
+    "PA2-SELATAN": (0.702, 0.682, 117.475, 117.435),
+    "PA3-UTARA": (0.674, 0.629, 117.470, 117.422),
+    "PA3-SELATAN": (0.608, 0.570, 117.465, 117.425),
+}
+POLYGONS = {}
+EXCLUDED_PREFIXES = ("IN", "FRONT", "DISP", "GPS")
+EXCLUDED_SUBSTRING = "CS"
+
+BOX_REGIONS = dict(REGIONS)
+
+def bounds(vertices: list) -> tuple:
+    lats = [lat for lat, _ in vertices]
+    lons = [lon for _, lon in vertices]
+    return max(lats), min(lats), max(lons), min(lons)
+
+def configure(polygons: dict) -> bool:
+    """Apply the polygon pit boundaries listed under 'regions' in config.json, as {name: [[lat, lon], ...]},
+    on top of the bounding-box regions. Returns True when the region set changed."""
+    polygons = {name: [list(vertex) for vertex in vertices] for name, vertices in polygons.items()}
+    boxes = {**BOX_REGIONS, **{name: bounds(vertices) for name, vertices in polygons.items()}}
+    if polygons == POLYGONS and boxes == REGIONS:
+        return False
+    for name in [name for name in POLYGONS if name not in polygons]:
+        del POLYGONS[name]
+    for name in [name for name in REGIONS if name not in boxes]:
+        del REGIONS[name]
+    REGIONS.update(boxes)
+    POLYGONS.update(polygons)
+    return True
+
+def region_bit(region: str) -> int:
+    return 1 << list(REGIONS).index(region)
+
+def in_bbox(lat: np.ndarray, lon: np.ndarray, region: str) -> np.ndarray:
+    max_lat, min_lat, max_lon, min_lon = REGIONS[region]
+    return (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+
+def region_mask(df: pd.DataFrame) -> np.ndarray:
+    lat = df["pos_lat"].to_numpy()
+    lon = df["pos_lon"].to_numpy()
+    mask = np.zeros(len(df), dtype=np.uint32)
+    for region in list(REGIONS):
+        inside = in_bbox(lat, lon, region)
+        if region in POLYGONS and inside.any():
+            from matplotlib.path import Path
+            candidates = np.flatnonzero(inside)
+            points = np.column_stack([lat[candidates], lon[candidates]])
+            inside[candidates] = Path(POLYGONS[region]).contains_points(points)
+        mask[inside] |= region_bit(region)
+    return mask
+
+def excluded_flag(pos_name: pd.Series) -> np.ndarray:
+    names = pos_name if isinstance(pos_name.dtype, pd.CategoricalDtype) else pos_name.astype("category")
+    categories = names.cat.categories.to_series()
+    excluded = (categories.str.startswith(EXCLUDED_PREFIXES, na=False) |
+                categories.str.contains(EXCLUDED_SUBSTRING, na=False)).to_numpy()
+    codes = names.cat.codes.to_numpy()
+    return np.append(excluded, False)[codes]
+
+def label(df: pd.DataFrame) -> pd.DataFrame:
+    if "pos_lat" in df.columns and "pos_lon" in df.columns:
+        df["region_mask"] = region_mask(df)
+    if "pos_name" in df.columns:
+        df["pos_excluded"] = excluded_flag(df["pos_name"])
+    return df
@@ -0,0 +1,157 @@
+import bisect
+import difflib
+from datetime import datetime
+
+ARG_TYPES = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "date": lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+}
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+class Route:
+    def __init__(self, name: str, handler, args: list):
+        self.name = name
+        self.handler = handler
+        self.args = args
+
+    @property
+    def text(self) -> str:
+        return " ".join([self.name, *self.args])
+
+class Handler:
+    """Base for routed commands. Services build a job; control handlers (kind None) answer directly."""
+    kind = None
+    takes_args = False
+
+    def __init__(self, name: str, config: dict = None):
+        self.name = name
+        self.config = config or {}
+
+    def handle(self, bot, session, sender, route: Route, force_refresh: bool = False):
+        build = self.build(bot, route.args, force_refresh)
+        bot.log.info(f"Processing request: {route.text} from {sender} ({session.name})")
+        bot.submit_job(route.text, self.kind, build, [session], sender)
+
+    def build(self, bot, args: list, force_refresh: bool = False):
+        raise NotImplementedError
+
+class AffirmativeHandler(Handler):
+    def handle(self, bot, session, sender, route, force_refresh=False):
+        bot.log.debug(f"{sender} responded affirmatively")
+        bot.reply(session, bot.messages["ask_help"])
+
+class HelpHandler(Handler):
+    def handle(self, bot, session, sender, route, force_refresh=False):
+        bot.log.debug(f"{sender} requested help")
+        bot.reply(session, bot.help_text, is_multiline=True)
+
+class NegativeHandler(Handler):
+    def handle(self, bot, session, sender, route, force_refresh=False):
+        bot.log.info(f"Session ended by user: {sender} ({session.name})")
+        session.end(sender)
+        bot.reply(session, bot.messages["session_end"])
+
+class ReportHandler(Handler):
+    kind = "image"
+
+    def build(self, bot, args, force_refresh=False):
+        return lambda: bot.render_report(self.name)
+
+class PythonHandler(Handler):
+    kind = "image"
+
+    def build(self, bot, args, force_refresh=False):
+        return lambda: bot.render_python(self.name, force_refresh)
+
+class SqlHandler(Handler):
+    """SQL command whose params may carry a type, e.g. "params": ["UnitEqNum", "shift:int", "date:date"]."""
+    kind = "text"
+    takes_args = True
+
+    def __init__(self, name, config=None):
+        super().__init__(name, config)
+        self.params = []
+        for param in self.config.get("params", []):
+            param_name, _, type_name = param.partition(":")
+            self.params.append((param_name, type_name or "str", ARG_TYPES.get(type_name or "str", str)))
+
+    def parse(self, args: list) -> list:
+        values = list(args)
+        for i, (param_name, type_name, convert) in enumerate(self.params[:len(values)]):
+            try:
+                values[i] = convert(values[i])
+            except ValueError:
+                raise ValueError(f"Maaf parameter {param_name} harus berupa {type_name}") from None
+        return values
+
+    def build(self, bot, args, force_refresh=False):
+        try:
+            values = self.parse(args)
+        except ValueError as e:
+            message = str(e)
+            return lambda: [message]
+        return lambda: bot.execute_sql(self.name, values, timeout=60, force_refresh=force_refresh)
+
+# config section -> handler class; later sections win when a command name appears twice
+SERVICE_HANDLERS = {
+    "python_service": PythonHandler,
+    "sql_service": SqlHandler,
+    "reporting_service": ReportHandler,
+}
+
+def register_service(section: str, handler_class):
+    SERVICE_HANDLERS[section] = handler_class
+
+class Router:
+    """Normalized command -> handler. Exact names and "<command> <args>" resolve with dict lookups; a unique
+    prefix of an argument-less command ("dotrace" -> "dotrace pa2") falls back to a bisect over the names."""
+    def __init__(self, min_prefix: int = 3):
+        self.min_prefix = min_prefix
+        self.commands = {}
+        self._names = []
+
+    def register(self, name: str, handler: Handler):
+        name = normalize(name)
+        if name not in self.commands:
+            bisect.insort(self._names, name)
+        self.commands[name] = handler
+
+    def route(self, text: str):
+        text = normalize(text)
+        handler = self.commands.get(text)
+        if handler:
+            return Route(text, handler, [])
+        head, _, rest = text.partition(" ")
+        handler = self.commands.get(head)
+        if handler and handler.takes_args:
+            return Route(head, handler, rest.split())
+        if len(text) >= self.min_prefix:
+            i = bisect.bisect_left(self._names, text)
+            matches = self._names[i:i + 2]
+            if matches and matches[0].startswith(text) and not (len(matches) > 1 and matches[1].startswith(text)):
+                handler = self.commands[matches[0]]
+                if handler.kind and not handler.takes_args:
+                    return Route(matches[0], handler, [])
+        return None
+
+    def suggest(self, text: str, n: int = 3) -> list:
+        text = normalize(text)
+        names = [name for name, handler in self.commands.items() if handler.kind]
+        return difflib.get_close_matches(text, names, n, cutoff=0.6) or [
+            name for name in names if name.startswith(text.split(" ")[0])][:n]
+
+def build(config: dict) -> Router:
+    router = Router()
+    for word in config["affirmative_keywords"]:
+        router.register(word, AffirmativeHandler(word))
+    router.register("help", HelpHandler("help"))
+    for word in config["negative_keywords"]:
+        router.register(word, NegativeHandler(word))
+    for section, handler_class in SERVICE_HANDLERS.items():
+        for name, service in config.get(section, {}).items():
+            router.register(name, handler_class(name, service))
+    return router
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+create table if not exists scheduler_runs (
+    slot_date text not null,
+    slot_time text not null,
+    command text not null,
+    group_name text not null,
+    status text not null,
+    job_id text,
+    updated_at text not null,
+    primary key (slot_date, slot_time, command, group_name)
+) without rowid;
+create table if not exists scheduler_meta (
+    key text primary key,
+    value text not null
+) without rowid;
+"""
+
+FINAL_STATUSES = ("sent", "skipped")
+
+class ScheduleStore:
+    """Scheduler runs keyed by (date, slot, command, group), so a restarted bot neither re-sends nor skips a slot."""
+    def __init__(self, path: str = "scheduler.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(slot: datetime, command: str, group: str):
+        return f"{slot:%Y-%m-%d}", f"{slot:%H:%M}", command, group
+
+    def status(self, slot: datetime, command: str, group: str):
+        with self._lock:
+            row = self._conn.execute(
+                "select status from scheduler_runs where slot_date = ? and slot_time = ? and command = ? and group_name = ?",
+                self._key(slot, command, group)).fetchone()
+        return row[0] if row else None
+
+    def claim(self, slot: datetime, command: str, group: str, job_id: str = None) -> bool:
+        """Record the run as scheduled unless it already finished; returns False for a finished run."""
+        now = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+        with self._lock:
+            cursor = self._conn.execute(
+                "insert into scheduler_runs values (?, ?, ?, ?, 'scheduled', ?, ?) "
+                "on conflict (slot_date, slot_time, command, group_name) do update set "
+                "status = 'scheduled', job_id = excluded.job_id, updated_at = excluded.updated_at "
+                f"where scheduler_runs.status not in {FINAL_STATUSES}",
+                (*self._key(slot, command, group), job_id, now))
+            return cursor.rowcount > 0
+
+    def mark(self, slot: datetime, command: str, group: str, status: str, job_id: str = None):
+        now = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+        with self._lock:
+            self._conn.execute(
+                "insert into scheduler_runs values (?, ?, ?, ?, ?, ?, ?) "
+                "on conflict (slot_date, slot_time, command, group_name) do update set "
+                "status = excluded.status, job_id = coalesce(excluded.job_id, scheduler_runs.job_id), "
+                "updated_at = excluded.updated_at",
+                (*self._key(slot, command, group), status, job_id, now))
+
+    def heartbeat(self, now: datetime = None):
+        with self._lock:
+            self._conn.execute("insert or replace into scheduler_meta values ('last_alive', ?)",
+                               (f"{now or datetime.now():%Y-%m-%d %H:%M:%S}",))
+
+    def last_alive(self):
+        """When the previous process last reported in, or None for a fresh store."""
+        with self._lock:
+            row = self._conn.execute("select value from scheduler_meta where key = 'last_alive'").fetchone()
+        return datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S") if row else None
+
+    def prune(self, before: datetime):
+        with self._lock:
+            self._conn.execute("delete from scheduler_runs where slot_date < ?", (f"{before:%Y-%m-%d}",))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
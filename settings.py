@@ -0,0 +1,146 @@
+import os
+import json
+import router
+
+REQUIRED = {
+    "affirmative_keywords": list,
+    "negative_keywords": list,
+    "messages": dict,
+    "help_text": list,
+    "reporting_service": dict,
+    "sql_service": dict,
+    "python_service": dict,
+    "scheduler_service": dict,
+}
+OPTIONAL = {
+    "groupname": str,
+    "groups": list,
+    "userdata_dir": str,
+    "headless": bool,
+    "job_workers": int,
+    "preload_plugins": bool,
+    "poll_interval": (int, float),
+    "sql_cache_size": int,
+    "refresh_suffix": str,
+    "max_consecutive_errors": int,
+    "max_sessions": int,
+    "restart_delay": (int, float),
+    "throughput_window": (int, float),
+    "waits": dict,
+    "ssrs": dict,
+    "scheduler_options": dict,
+    "report_pool": dict,
+    "upload": dict,
+    "db_pool": dict,
+    "regions": dict,
+}
+SERVICE_KEYS = {
+    "reporting_service": ("url", "caption"),
+    "sql_service": ("sql_file", "server", "database"),
+    "python_service": ("python_path", "class_name", "method", "parameter"),
+}
+# keys a report needs whenever it may be rendered in the browser (any mode but url_access without fallback)
+BROWSER_REPORT_KEYS = ("parameter", "detection", "body", "width", "height")
+MESSAGE_KEYS = ("activation", "wait", "ask_help", "session_end", "unknown", "no_response", "confirmation",
+                "processing", "queued")
+
+class ConfigError(ValueError):
+    pass
+
+def _type_name(expected) -> str:
+    return " or ".join(t.__name__ for t in expected) if isinstance(expected, tuple) else expected.__name__
+
+def _services(config: dict, section: str):
+    services = config.get(section)
+    return [(name, service) for name, service in services.items() if isinstance(service, dict)] \
+        if isinstance(services, dict) else []
+
+def _is_commands(value) -> bool:
+    return isinstance(value, list) and all(isinstance(command, str) for command in value)
+
+def _schedule_errors(schedule: dict, where: str) -> list:
+    return [f"{where}['{spec}'] must be a list of commands" for spec, commands in schedule.items()
+            if not _is_commands(commands)]
+
+def validate(config: dict) -> dict:
+    """Raise ConfigError listing every problem found, so one bad edit is reported in a single log line."""
+    if not isinstance(config, dict):
+        raise ConfigError("top level must be an object")
+    errors = []
+    for key, expected in {**REQUIRED, **OPTIONAL}.items():
+        if key not in config:
+            if key in REQUIRED:
+                errors.append(f"missing '{key}'")
+        elif not isinstance(config[key], expected):
+            errors.append(f"'{key}' must be {_type_name(expected)}")
+    if not config.get("groups") and not isinstance(config.get("groupname"), str):
+        errors.append("either 'groups' or 'groupname' is required")
+    for i, group in enumerate(config.get("groups") or []):
+        if not isinstance(group, dict) or not isinstance(group.get("name"), str):
+            errors.append(f"groups[{i}] needs a 'name'")
+        else:
+            if "commands" in group and not _is_commands(group["commands"]):
+                errors.append(f"groups[{i}].commands must be a list of commands")
+            if not isinstance(group.get("scheduler", {}), dict):
+                errors.append(f"groups[{i}].scheduler must be dict")
+            else:
+                errors += _schedule_errors(group.get("scheduler", {}), f"groups[{i}].scheduler")
+    for section, keys in SERVICE_KEYS.items():
+        if isinstance(config.get(section), dict):
+            errors += [f"{section}.{name} must be dict" for name, service in config[section].items()
+                       if not isinstance(service, dict)]
+        for name, service in _services(config, section):
+            errors += [f"{section}.{name} is missing '{key}'" for key in keys if key not in service]
+    for name, service in _services(config, "reporting_service"):
+        export = service.get("export")
+        if service.get("mode") == "url_access" and not (isinstance(export, dict) and "url" in export):
+            errors.append(f"reporting_service.{name} in url_access mode needs an 'export' object with 'url'")
+        elif service.get("mode") == "url_access" and not export.get("fallback", True):
+            continue
+        errors += [f"reporting_service.{name} is missing '{key}'" for key in BROWSER_REPORT_KEYS if key not in service]
+    for name, service in _services(config, "python_service"):
+        fallback = service.get("fallback")
+        if fallback is not None and not (isinstance(fallback, dict) and "method" in fallback):
+            errors.append(f"python_service.{name}.fallback needs a 'method'")
+            fallback = None
+        if "html" in (service.get("output_type"), (fallback or {}).get("output_type")):
+            errors += [f"python_service.{name} renders html and is missing '{key}'"
+                       for key in ("width", "height") if key not in service]
+    for name, service in _services(config, "sql_service"):
+        for param in service.get("params", []):
+            type_name = str(param).partition(":")[2]
+            if type_name and type_name not in router.ARG_TYPES:
+                errors.append(f"sql_service.{name} param '{param}' has unknown type '{type_name}'")
+    if isinstance(config.get("messages"), dict):
+        errors += [f"messages is missing '{key}'" for key in MESSAGE_KEYS if key not in config["messages"]]
+    if isinstance(config.get("scheduler_service"), dict):
+        errors += _schedule_errors(config["scheduler_service"], "scheduler_service")
+    for name, vertices in config.get("regions", {}).items() if isinstance(config.get("regions"), dict) else []:
+        if not (isinstance(vertices, list) and len(vertices) >= 3 and all(
+                isinstance(vertex, list) and len(vertex) == 2 and
+                all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in vertex) for vertex in vertices)):
+            errors.append(f"regions.{name} must be a list of at least 3 [lat, lon] pairs")
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return config
+
+class ConfigFile:
+    """config.json re-read only when its mtime or size changes."""
+    def __init__(self, path: str = "config.json"):
+        self.path = path
+        self.signature = None
+
+    def load(self, force: bool = False):
+        """Return the validated config, or None when the file is unchanged since the last attempt."""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self.signature and not force:
+                return None
+            with open(self.path, "r", encoding="utf-8") as file:
+                config = json.load(file)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"unable to read {self.path}: {e}") from e
+        validate(config)
+        self.signature = signature
+        return config
@@ -7,4 +7,4 @@ SELECT
     ';IBS: ' + UnitEqClassIBS + 
     ';Updated: ' + CONVERT(VARCHAR(19), update_at, 120)
 FROM db_ewacs_fgdp.dbo.unit
-WHERE UnitEqNum = '{UnitEqNum}' AND unitstatus = 1;
\ No newline at end of file
+WHERE UnitEqNum = ? AND unitstatus = 1;
\ No newline at end of file
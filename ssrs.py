@@ -0,0 +1,74 @@
+import threading
+from urllib.parse import quote
+import requests
+from requests.adapters import HTTPAdapter
+
+_settings = {
+    "pool_size": 4,
+    "timeout": 60,
+    "auth": None,
+}
+_session = None
+_lock = threading.Lock()
+
+class ExportError(Exception):
+    pass
+
+def configure(**settings):
+    global _session
+    settings = {k: v for k, v in settings.items() if k in _settings}
+    with _lock:
+        if _session is not None and any(_settings[k] != v for k, v in settings.items()):
+            _session.close()
+            _session = None
+        _settings.update(settings)
+
+def _auth(auth: dict):
+    if not auth:
+        return None
+    if auth.get("type") == "ntlm":
+        from requests_ntlm import HttpNtlmAuth
+        return HttpNtlmAuth(auth["username"], auth["password"])
+    return requests.auth.HTTPBasicAuth(auth["username"], auth["password"])
+
+def get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_settings["pool_size"], pool_maxsize=_settings["pool_size"])
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.auth = _auth(_settings["auth"])
+            _session = session
+        return _session
+
+def export_url(url: str, parameters: dict, fmt: str = "IMAGE", device_info: dict = None) -> str:
+    """Build a URL-access render request, e.g. ReportServer?%2fReport&rs:Format=IMAGE&rc:OutputFormat=PNG&date=..."""
+    query = [("rs:Command", "Render"), ("rs:Format", fmt)]
+    query += [(f"rc:{name}", value) for name, value in (device_info or {}).items()]
+    for name, value in parameters.items():
+        for item in value if isinstance(value, list) else [value]:
+            query.append((f"{name}:isnull", "true") if item is None else (name, item))
+    return url + "".join(f"&{quote(str(k), safe=':')}={quote(str(v), safe='')}" for k, v in query)
+
+def export(url: str, parameters: dict, path: str, fmt: str = "IMAGE", device_info: dict = None,
+           timeout: float = None) -> str:
+    request_url = export_url(url, parameters, fmt, device_info)
+    try:
+        response = get_session().get(request_url, timeout=timeout or _settings["timeout"])
+    except requests.RequestException as e:
+        raise ExportError(f"SSRS export failed: {e}") from e
+    content_type = response.headers.get("Content-Type", "")
+    if response.status_code != 200 or content_type.startswith("text/"):
+        raise ExportError(f"SSRS export returned {response.status_code} ({content_type}): {response.text[:200]}")
+    with open(path, "wb") as f:
+        f.write(response.content)
+    return path
+
+def close():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None